@@ -0,0 +1,108 @@
+"""
+Asynchronous Modbus access for the LiveX adapters.
+
+AsyncModbusBackend gives awaitable equivalents of the read/write helpers in livex.util for code
+running on the IOLoop. Each request is run on the worker thread of a CommandQueue, using the same
+client (and so the same connection) as everything else talking to the device, and the coroutine
+waits for its result without blocking the IOLoop. Requests on the connection still go one at a
+time: this keeps the IOLoop free while waiting for the device, rather than pipelining. To cut the
+number of round trips, read related registers together, e.g. with a BlockReader through run().
+
+    values = await backend.run(reader.read, backend.client)
+    running = await backend.read_coil(modAddr.trig_0_running_coil)
+"""
+import asyncio
+import logging
+import time
+
+from livex.codec import decode_float, decode_floats, float_payload
+from livex.command_queue import Priority
+
+class AsyncModbusBackend():
+    """Class providing awaitable Modbus reads and writes, run through a CommandQueue."""
+
+    def __init__(self, client, command_queue, priority=Priority.BACKGROUND):
+        """Initialise the backend.
+        :param client: ModbusTcpClient (or mock), not itself queued, whose connection is shared
+        :param command_queue: CommandQueue that every other user of the client goes through too
+        :param priority: Priority of the requests made by the backend
+        """
+        self.client = client
+        self.command_queue = command_queue
+        self.priority = priority
+
+        self.requests = 0
+        self.latency = 0  # Time taken by the last request, including waiting in the queue
+
+    @property
+    def connected(self):
+        """Whether the connection to the device is open."""
+        return getattr(self.client, 'connected', True)
+
+    async def run(self, func, *args, **kwargs):
+        """Run a function using the client on the command queue worker, and wait for its result.
+        :param func: callable making one or more requests, e.g. BlockReader.read
+        :return: the result of func
+        """
+        started = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(
+                self.command_queue.submit(func, *args, priority=self.priority, **kwargs)
+            )
+        finally:
+            self.requests += 1
+            self.latency = time.perf_counter() - started
+
+    async def _request(self, method, *args, **kwargs):
+        """Make a request of the client, raising an error if the device returned one."""
+        response = await self.run(getattr(self.client, method), *args, **kwargs)
+        if hasattr(response, 'isError') and response.isError():
+            raise ConnectionError(f"Modbus {method} failed: {response}")
+        return response
+
+    # Awaitable equivalents of livex.util
+
+    async def read_coil(self, address, asInt=False):
+        """Read the value of a coil, optionally as an int."""
+        response = await self._request('read_coils', address, count=1, slave=1)
+        bit = response.bits[0]
+        return (1 if bit else 0) if asInt else bit
+
+    async def write_coil(self, address, value=0):
+        """Write a boolean value to a coil."""
+        return await self._request('write_coil', address, value, slave=1)
+
+    async def read_decode_input_reg(self, address):
+        """Read and decode a float from an input register address (two registers)."""
+        response = await self._request('read_input_registers', address, count=2, slave=1)
+        return self._check_nan(decode_float(response.registers), address)
+
+    async def read_decode_holding_reg(self, address):
+        """Read and decode a float from a holding register address (two registers)."""
+        response = await self._request('read_holding_registers', address, count=2, slave=1)
+        return self._check_nan(decode_float(response.registers), address)
+
+    async def write_modbus_float(self, value, address):
+        """Write a float to a holding register address (two registers)."""
+        return await self._request(
+            'write_registers', address, float_payload(float(value)), slave=1, skip_encode=True
+        )
+
+    async def read_floats(self, address, count, holding=True):
+        """Read and decode consecutive floats in one request.
+        :param address: address of the first float
+        :param count: number of floats
+        :param holding: read holding registers if True, input registers if False
+        :return: list of floats
+        """
+        method = 'read_holding_registers' if holding else 'read_input_registers'
+        response = await self._request(method, address, count=count * 2, slave=1)
+        return decode_floats(response.registers).tolist()
+
+    @staticmethod
+    def _check_nan(value, address):
+        """Replace NaN with -1.0, as read_decode_input_reg does."""
+        if value != value:
+            logging.debug(f"ISNAN when reading from address {address}")
+            return -1.0
+        return value
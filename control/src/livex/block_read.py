@@ -0,0 +1,99 @@
+import logging
+import time
+
+import numpy as np
+
+from livex.codec import decode_floats
+
+# Largest number of registers (and coils) a single Modbus read request can return
+MAX_READ_REGISTERS = 125
+MAX_READ_COILS = 2000
+
+class BlockReader():
+    """Class to read many float registers from a Modbus device in as few requests as possible.
+
+    Named float addresses (two registers each) are sorted and merged into contiguous blocks, each
+    fetched with a single read, and coils likewise. Small gaps between addresses can be read
+    through rather than starting a new request, but only where every address in the gap is known
+    to exist on the device: reading an unmapped address fails the whole request. The floats in a
+    block are then decoded together with NumPy, using the LiveX word order (low word first, each
+    word big-endian) as in read_decode_input_reg.
+    """
+
+    def __init__(self, input_registers=None, holding_registers=None, coils=None, max_gap=0,
+                 max_count=MAX_READ_REGISTERS, mapped=None):
+        """Plan the block reads.
+        :param input_registers: dict of name to address of float input registers
+        :param holding_registers: dict of name to address of float holding registers
+        :param coils: dict of name to address of coils
+        :param max_gap: most unused registers (or coils) to read through to join two blocks
+        :param max_count: most registers read in one request
+        :param mapped: optional dict of kind ('input', 'holding' or 'coil') to the set of addresses
+        that exist on the device. If given, gaps are only read through where every address in them
+        is mapped
+        """
+        self.max_gap = max_gap
+        mapped = mapped or {}
+        self.blocks = (
+            [('input', *block) for block in
+             self.plan(input_registers or {}, 2, max_count, mapped.get('input'))]
+            + [('holding', *block) for block in
+               self.plan(holding_registers or {}, 2, max_count, mapped.get('holding'))]
+            + [('coil', *block) for block in
+               self.plan(coils or {}, 1, MAX_READ_COILS, mapped.get('coil'))]
+        )
+
+        self.round_trips = 0  # Requests made in the last read
+        self.duration = 0  # Time taken by the last read, in seconds
+
+    def plan(self, addresses, width=2, max_count=MAX_READ_REGISTERS, mapped=None):
+        """Merge addresses into blocks to read.
+        :param addresses: dict of name to address of the first register of each value
+        :param width: number of registers (or coils) in each value
+        :param max_count: most registers (or coils) read in one request
+        :param mapped: optional set of addresses that can be read through, any address if None
+        :return: list of (start address, count, names, offsets of each value in block)
+        """
+        blocks = []
+        for name, address in sorted(addresses.items(), key=lambda item: item[1]):
+            if blocks:
+                start, count, names, offsets = blocks[-1]
+                end = address + width
+                gap = range(start + count, address)
+                if (len(gap) <= self.max_gap and end - start <= max_count
+                        and (mapped is None or mapped.issuperset(gap))):
+                    blocks[-1] = (start, max(count, end - start), names + [name],
+                                  offsets + [address - start])
+                    continue
+            blocks.append((address, width, [name], [0]))
+
+        return [(start, count, names, np.array(offsets)) for start, count, names, offsets in blocks]
+
+    def read(self, client):
+        """Read every planned block and decode the floats in each.
+        :param client: ModbusTcpClient (or mock) to read with
+        :return: dict of name to decoded float (or bool for coils), with NaN values returned as -1.0
+        """
+        started = time.perf_counter()
+        values = {}
+        for kind, start, count, names, offsets in self.blocks:
+            if kind == 'coil':
+                response = client.read_coils(start, count=count, slave=1)
+                values.update(
+                    (name, bool(response.bits[offset])) for name, offset in zip(names, offsets)
+                )
+                continue
+            if kind == 'input':
+                response = client.read_input_registers(start, count=count, slave=1)
+            else:
+                response = client.read_holding_registers(start, count=count, slave=1)
+            values.update(zip(names, decode_floats(response.registers, offsets).tolist()))
+
+        self.round_trips = len(self.blocks)
+        self.duration = time.perf_counter() - started
+
+        for name, value in values.items():
+            if value != value:  # NaN. Error is hard to reproduce but good to account for
+                logging.debug(f"ISNAN when reading {name}")
+                values[name] = -1.0
+        return values
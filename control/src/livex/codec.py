@@ -0,0 +1,64 @@
+"""
+Encoding and decoding of floats held in Modbus registers by the LiveX PLCs.
+
+Each float takes two 16-bit registers: the low word comes first, and each word is big-endian
+(pymodbus wordorder=Endian.LITTLE, byteorder=Endian.BIG). The structs and dtypes here are made
+once, so single values are converted without building a pymodbus payload object each time, and
+whole arrays of registers are converted in one NumPy call.
+"""
+import struct
+
+import numpy as np
+
+_FLOAT = struct.Struct('>f')
+_WORDS = struct.Struct('>HH')
+# Big-endian 16-bit words, used to view float arrays as registers
+_WORD_DTYPE = np.dtype('>u2')
+_FLOAT_DTYPE = np.dtype('>f4')
+
+def decode_float(registers):
+    """Decode a float from its two registers.
+    :param registers: sequence of two 16-bit register values, low word first
+    """
+    return _FLOAT.unpack(_WORDS.pack(registers[1], registers[0]))[0]
+
+def encode_float(value):
+    """Encode a float as a list of two registers, low word first."""
+    high, low = _WORDS.unpack(_FLOAT.pack(value))
+    return [low, high]
+
+def decode_floats(registers, offsets=None):
+    """Decode floats from an array of registers.
+    :param registers: sequence of 16-bit register values
+    :param offsets: optional array of the index of the first register of each float, by default
+    every pair of registers from the start
+    :return: NumPy array of floats
+    """
+    registers = np.asarray(registers, dtype=np.uint32)
+    if offsets is None:
+        offsets = np.arange(0, len(registers) - 1, 2)
+    # First register is the low word
+    words = (registers[offsets + 1] << 16) | registers[offsets]
+    return words.view(np.float32)
+
+def encode_floats(values):
+    """Encode a sequence of floats as a list of registers, two per float.
+    :param values: sequence of floats
+    :return: list of 16-bit register values
+    """
+    words = np.asarray(values, dtype=_FLOAT_DTYPE).view(_WORD_DTYPE).reshape(-1, 2)
+    return words[:, ::-1].ravel().tolist()
+
+def float_payload(values):
+    """Encode floats as the payload of a write_registers call with skip_encode=True.
+    :param values: float, or sequence of floats
+    :return: list of two-byte strings, one per register
+    """
+    words = np.asarray(values, dtype=_FLOAT_DTYPE).reshape(-1).view(_WORD_DTYPE).reshape(-1, 2)
+    data = words[:, ::-1].tobytes()
+    return [data[i:i + 2] for i in range(0, len(data), 2)]
+
+def payload_registers(payload):
+    """Convert a write_registers payload of two-byte strings back to register values."""
+    data = b"".join(payload)
+    return np.frombuffer(data, dtype=_WORD_DTYPE).tolist()
@@ -0,0 +1,178 @@
+import contextlib
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from enum import IntEnum
+
+class Priority(IntEnum):
+    """Priority of a Modbus request. Lower values are served first."""
+    EMERGENCY = 0  # e.g. stopping the PIDs
+    USER = 1  # Requests made from the parameter tree or sequences
+    BACKGROUND = 2  # Polling
+
+class CommandQueue():
+    """Class to serialise all traffic to a Modbus device through one worker thread.
+
+    Requests from any thread are put on a priority queue and run one at a time by the worker,
+    which is the only thread to use the client. Transactions therefore cannot interleave, and a
+    queued emergency request is run before any queued user request, which in turn come before
+    background polling. Requests of the same priority run in the order they were made. Priority
+    only orders the requests waiting: a request already running is never interrupted.
+    """
+
+    def __init__(self):
+        """Initialise the queue. The worker thread is started by the first request."""
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()  # Keeps requests of equal priority in order
+        self.thread = None
+        self.lock = threading.Lock()
+        self.closed = False
+        self._local = threading.local()
+
+        self.stats = {priority: _LatencyStats() for priority in Priority}
+
+    @property
+    def depth(self):
+        """Number of requests waiting to run."""
+        return self.queue.qsize()
+
+    @property
+    def current_priority(self):
+        """Priority given to requests made by the current thread."""
+        return getattr(self._local, 'priority', Priority.USER)
+
+    @contextlib.contextmanager
+    def priority(self, priority):
+        """Make requests from the current thread at a given priority within the block."""
+        previous = self.current_priority
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def submit(self, func, *args, priority=None, **kwargs):
+        """Queue a request to be run by the worker thread.
+        :param func: callable making the request
+        :param priority: Priority of the request, that of the current thread by default
+        :return: Future for the result of the request
+        """
+        priority = self.current_priority if priority is None else Priority(priority)
+        future = Future()
+        if self.closed:
+            future.set_exception(RuntimeError("Command queue is closed"))
+            return future
+        self._start()
+        self.queue.put(
+            (priority, next(self.order), time.perf_counter(), future, func, args, kwargs)
+        )
+        return future
+
+    def call(self, func, *args, priority=None, **kwargs):
+        """Queue a request and wait for its result (any exception it raises is raised here)."""
+        if threading.current_thread() is self.thread:
+            return func(*args, **kwargs)  # Already on the worker, so waiting would deadlock
+        return self.submit(func, *args, priority=priority, **kwargs).result()
+
+    def close(self, timeout=5):
+        """Run the requests already queued, then stop the worker thread.
+        Requests made after this fail instead of starting the worker again.
+        :param timeout: time in seconds to wait for the worker to finish
+        """
+        with self.lock:
+            self.closed = True
+            thread = self.thread
+        if not (thread and thread.is_alive()):
+            return
+        # Sorts after every request, so the worker stops once the queue is drained
+        self.queue.put((len(Priority), next(self.order), None, None, None, None, None))
+        if thread is not threading.current_thread():
+            thread.join(timeout)
+            if thread.is_alive():
+                logging.warning("Modbus command queue did not finish in time")
+
+    def _start(self):
+        """Start the worker thread if it is not running."""
+        with self.lock:
+            if not (self.thread and self.thread.is_alive()):
+                self.thread = threading.Thread(target=self._run, name="ModbusCommandQueue", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        """Worker thread loop, running requests in priority order."""
+        while True:
+            priority, _, queued_time, future, func, args, kwargs = self.queue.get()
+            if future is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            self.stats[priority].record(time.perf_counter() - queued_time)
+
+    def stats_tree(self):
+        """Get a dict of latency statistics by priority name, for a parameter tree."""
+        return {
+            priority.name.lower(): {
+                'count': (lambda s=stats: s.count, None),
+                'latency': (lambda s=stats: s.latency, None),
+                'mean_latency': (lambda s=stats: s.mean, None),
+                'max_latency': (lambda s=stats: s.max, None)
+            }
+            for priority, stats in self.stats.items()
+        }
+
+class _LatencyStats():
+    """Running statistics of the time from requests being queued to them completing."""
+
+    def __init__(self):
+        self.count = 0
+        self.latency = 0
+        self.total = 0
+        self.max = 0
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def record(self, latency):
+        self.count += 1
+        self.latency = latency
+        self.total += latency
+        self.max = max(self.max, latency)
+
+class QueuedClient():
+    """Wrapper for a Modbus client that sends every read and write through a CommandQueue.
+
+    Requests are made at the priority of the calling thread (see CommandQueue.priority), and the
+    caller waits for the result as it would with the client itself.
+    """
+
+    def __init__(self, client, command_queue):
+        """Wrap a client.
+        :param client: ModbusTcpClient (or mock)
+        :param command_queue: CommandQueue shared by everything using the client
+        """
+        self.client = client
+        self.command_queue = command_queue
+
+    def __getattr__(self, name):
+        """Queue reads and writes, and pass anything else (e.g. connect) to the client."""
+        attr = getattr(self.client, name)
+        if name.startswith(('read_', 'write_')) and callable(attr):
+            def queued(*args, **kwargs):
+                return self.command_queue.call(attr, *args, **kwargs)
+            return queued
+        return attr
+
+    def close(self):
+        """Close the client once any requests already queued have run."""
+        try:
+            self.command_queue.call(self.client.close)
+        except Exception as e:
+            logging.debug(f"Error closing queued modbus client: {e}")
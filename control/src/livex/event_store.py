@@ -0,0 +1,128 @@
+import math
+import numbers
+import threading
+import time
+
+import numpy as np
+
+# One fixed-size record per event. Non-numeric values have a NaN value and index a string table
+EVENT_DTYPE = np.dtype([
+    ('frame', 'i8'),  # Stream frame when the event happened, -1 if unknown
+    ('timestamp', 'f8'),  # Host (wall-clock) time of the event
+    ('key', 'i4'),  # Index into the table of event keys
+    ('value', 'f8'),  # Numeric value, or NaN
+    ('text', 'i4')  # Index into the table of event strings, -1 for numeric values
+])
+
+class EventStore():
+    """Class to record events (e.g. setpoint or gradient changes) during an acquisition.
+
+    Events are kept as fixed-size records (see EVENT_DTYPE) so that they can be written to and
+    read back from a compound HDF5 dataset quickly. Event keys are dictionary-encoded: each record
+    holds the index of its key in a table of key names, and likewise for any non-numeric values.
+    The tables are written alongside the events, with only new entries added each time. When
+    events are added to a file that already holds tables, e.g. from an earlier acquisition, the
+    store is reset with those tables so that the indexes carry on from them.
+    """
+
+    def __init__(self):
+        """Initialise the store with empty event and string tables."""
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, keys=(), strings=()):
+        """Clear all events and tables, e.g. at the start of an acquisition.
+        :param keys: table of key names already in the file being written to
+        :param strings: table of string values already in the file being written to
+        """
+        with self.lock:
+            self.events = []
+            self.key_ids, self.key_offset = self._seed(keys)
+            self.text_ids, self.text_offset = self._seed(strings)
+            # Table entries not yet taken to be written
+            self.new_keys = []
+            self.new_texts = []
+
+    def add(self, key, value, frame=None, timestamp=None):
+        """Record an event.
+        :param key: name of the parameter that changed
+        :param value: new value. Numbers and bools are stored as floats, anything else as text
+        :param frame: stream frame at the time of the event, if known
+        :param timestamp: time of the event, the current time by default
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        frame = -1 if frame is None or not math.isfinite(frame) else int(frame)
+
+        with self.lock:
+            key_id = self._lookup(self.key_ids, self.new_keys, key, self.key_offset)
+            if isinstance(value, numbers.Number):
+                record = (frame, timestamp, key_id, float(value), -1)
+            else:
+                text_id = self._lookup(self.text_ids, self.new_texts, str(value), self.text_offset)
+                record = (frame, timestamp, key_id, math.nan, text_id)
+            self.events.append(record)
+
+    def take(self):
+        """Take the events and table entries recorded since the last call.
+        :return: dict of data for FileWriter.write_hdf5, empty if nothing new has been recorded
+        """
+        with self.lock:
+            if not self.events:
+                return {}
+            data = {'events': np.array(self.events, dtype=EVENT_DTYPE)}
+            if self.new_keys:
+                data['event_keys'] = self.new_keys
+            if self.new_texts:
+                data['event_strings'] = self.new_texts
+            self.events = []
+            self.new_keys = []
+            self.new_texts = []
+        return data
+
+    def restore(self, data):
+        """Put back data from take() that could not be written, to be taken again next time.
+        :param data: dict returned by take()
+        """
+        with self.lock:
+            self.events = [tuple(e) for e in data.get('events', [])] + self.events
+            self.new_keys = list(data.get('event_keys', [])) + self.new_keys
+            self.new_texts = list(data.get('event_strings', [])) + self.new_texts
+
+    @staticmethod
+    def decode(events, keys, strings):
+        """Convert event records read back from file into a list of (frame, key, value) tuples.
+        :param events: array of EVENT_DTYPE records
+        :param keys: table of key names
+        :param strings: table of string values
+        """
+        keys = [_as_str(k) for k in keys]
+        strings = [_as_str(s) for s in strings]
+        return [
+            (int(e['frame']), keys[e['key']], strings[e['text']] if e['text'] >= 0 else float(e['value']))
+            for e in events
+        ]
+
+    @staticmethod
+    def _seed(table):
+        """Index the names in an existing table.
+        :return: dict of name to its first index, and the number of repeated entries in the table,
+        which new entries are indexed past
+        """
+        ids = {}
+        for index, name in enumerate(table):
+            ids.setdefault(_as_str(name), index)
+        return ids, len(table) - len(ids)
+
+    @staticmethod
+    def _lookup(ids, new_entries, name, offset=0):
+        """Get the index of a name in a table, adding it to the table if it is not there."""
+        index = ids.get(name)
+        if index is None:
+            index = ids[name] = len(ids) + offset
+            new_entries.append(name)
+        return index
+
+def _as_str(name):
+    """Convert a table entry read back from file to a str."""
+    return name.decode() if isinstance(name, bytes) else name
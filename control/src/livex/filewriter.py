@@ -12,15 +12,157 @@ import h5py
 import os
 import numpy as np
 import logging
+import time
+from dataclasses import dataclass
+
+def parse_group_options(compression='', chunks=''):
+    """Build per-group dataset options for FileWriter from config strings.
+    :param compression: comma-separated group:filter[:level] entries, e.g. 'fast_data:lzf'
+    :param chunks: comma-separated group:rows entries, e.g. 'fast_data:1024, slow_data:64'
+    :return: dict of group name to dict of options
+    """
+    group_options = {}
+    for entry in [e.strip() for e in compression.split(",") if e.strip()]:
+        groupname, *args = [arg.strip() for arg in entry.split(":")]
+        options = group_options.setdefault(groupname, {})
+        options['compression'] = args[0]
+        if len(args) > 1:
+            options['compression_opts'] = int(args[1])
+
+    for entry in [e.strip() for e in chunks.split(",") if e.strip()]:
+        groupname, rows = [arg.strip() for arg in entry.split(":")]
+        group_options.setdefault(groupname, {})['chunks'] = int(rows)
+
+    return group_options
+
+# Attribute holding the rows written to a dataset, which can have room for more until it is trimmed
+ROWS_ATTR = 'rows'
+
+@dataclass
+class DatasetHandle:
+    dset: h5py.Dataset  # Open dataset
+    dtype: np.dtype  # dtype that data is converted to before writing
+    length: int = 0  # Rows written, which can be fewer than the dataset has room for
+    capacity: int = 0  # Rows allocated in the dataset
+    recorded: int = -1  # Length last stored in the rows attribute
+
+    def append(self, values, exact=False):
+        """Append rows to the dataset, growing it by doubling its capacity if needed.
+        :param values: array or list of rows, or a single value
+        :param exact: resize to exactly the rows written instead of doubling, e.g. for SWMR
+        """
+        new_data = np.asarray(values, dtype=self.dtype)  # No copy if dtype already matches
+        if new_data.ndim == 0:
+            new_data = new_data.reshape(1)
+
+        length = self.length + len(new_data)
+        if length > self.capacity:
+            self.capacity = length if exact else max(length, 2 * self.capacity)
+            self.dset.resize(self.capacity, axis=0)
+        self.dset[self.length:length] = new_data
+        self.length = length
+
+    def record_length(self):
+        """Store the rows written in the dataset's rows attribute, if changed since last stored."""
+        if self.recorded != self.length:
+            self.dset.attrs[ROWS_ATTR] = self.length
+            self.recorded = self.length
+
+    def trim(self):
+        """Shrink the dataset to the rows written to it."""
+        if self.capacity != self.length:
+            self.dset.resize(self.length, axis=0)
+            self.capacity = self.length
+
+class WriteSession():
+    """Class caching the groups and datasets of an open file, along with the dtype and length of
+    each dataset, so that they are only looked up once and each write is a single resize/assign.
+    """
+
+    def __init__(self, file_writer):
+        """Initialise the session for the file currently open in a FileWriter."""
+        self.file_writer = file_writer
+        self.file = file_writer.file
+        self.groups = {}
+        self.handles = {}  # (groupname, key): DatasetHandle, or None if it could not be created
+
+    def group(self, groupname):
+        """Get a group of the file, creating it if needed."""
+        group = self.groups.get(groupname)
+        if group is None:
+            group = self.groups[groupname] = self.file.require_group(groupname)
+        return group
+
+    def dataset(self, groupname, key, row_shape=()):
+        """Get the handle to a dataset, opening or creating the dataset on first use.
+        :param groupname: name of group holding the dataset
+        :param key: name of the dataset
+        :param row_shape: shape of each row, used if the dataset has to be created
+        :return: DatasetHandle, or None if the dataset does not exist and cannot be created
+        """
+        try:
+            return self.handles[(groupname, key)]
+        except KeyError:
+            pass
+
+        group = self.group(groupname)
+        dtype = self.file_writer._resolve_dtype(key)
+        if key in group:
+            # A file not closed properly can hold unwritten rows past the recorded length
+            dset = group[key]
+            length = int(dset.attrs.get(ROWS_ATTR, dset.shape[0]))
+            handle = DatasetHandle(dset, dtype, length=length, capacity=dset.shape[0], recorded=length)
+        elif self.file_writer.swmr and self.file.swmr_mode:
+            logging.warning(f"Dataset {groupname}/{key} cannot be created in SWMR mode")
+            handle = None
+        else:
+            dset = self.file_writer._create_dataset(group, key, dtype, row_shape)
+            handle = DatasetHandle(dset, dtype, capacity=dset.shape[0])
+
+        self.handles[(groupname, key)] = handle
+        return handle
+
+    def append(self, groupname, data):
+        """Append a dict of data to datasets of a group, keyed by dataset name."""
+        exact = self.file_writer.swmr
+        for key, values in data.items():
+            handle = self.handles.get((groupname, key)) or self.dataset(
+                groupname, key, np.shape(values)[1:]
+            )
+            if handle is not None:
+                handle.append(values, exact=exact)
+
+    def record_lengths(self):
+        """Store the rows written to each dataset in its rows attribute.
+        Not done in SWMR mode, where attributes cannot be written but datasets are never padded.
+        """
+        if self.file_writer.swmr:
+            return
+        for handle in self.handles.values():
+            if handle is not None:
+                handle.record_length()
+
+    def trim(self):
+        """Shrink every dataset to the rows written to it."""
+        for handle in self.handles.values():
+            if handle is not None:
+                handle.trim()
+        self.record_lengths()
 
 class FileWriter():
     """Class to handle the writing of hdf5 files."""
 
-    def __init__(self, filepath, filename, dtypes=None):
+    def __init__(self, filepath, filename, dtypes=None, group_options=None, swmr=False,
+                 flush_interval=1.0):
         """Initialise the Filewriter with a path and name, then open the file.
         :param filepath: path to file
         :param filename: name of file
         :param dtypes: optional dict detailing not-float object type of specific datasets
+        :param group_options: optional dict of group name to dataset options for that group:
+        chunks (rows per chunk), compression (e.g. 'lzf', 'gzip') and compression_opts
+        :param swmr: open files in single-writer/multiple-reader mode, so that they can be read
+        while being written
+        :param flush_interval: minimum time in seconds between flushes of the file to disk
         """
         self.filepath = filepath
         self.filename = filename
@@ -28,7 +170,14 @@ class FileWriter():
         os.makedirs(filepath, exist_ok=True)
 
         self.dtypes = dtypes
+        self.group_options = group_options or {}
         self.file = None
+        # Cached dataset handles for the open file
+        self.session = None
+
+        self.swmr = swmr
+        self.flush_interval = flush_interval
+        self.last_flush = 0
 
     def set_fullpath(self):
         """Set the full path of the filewriter."""
@@ -36,53 +185,101 @@ class FileWriter():
             self.filename += '.h5'
         self.full_path = os.path.join(self.filepath, self.filename)
 
-    def open_file(self, mode="a"):
+    def open_file(self, mode="a", layout=None):
         """Open the file in specified mode.
+        In SWMR mode, datasets cannot be added once readers are allowed in, so every dataset to be
+        written should be given in the layout.
         :param mode: mode to open file in. default a (append)
+        :param layout: optional dict of group name to list of dataset names to create on opening
         """
-        self.file = h5py.File(self.full_path, mode)
+        if self.swmr:
+            self.file = h5py.File(self.full_path, mode, libver='latest')
+        else:
+            self.file = h5py.File(self.full_path, mode)
+        self.session = WriteSession(self)
+
+        for groupname, keys in (layout or {}).items():
+            for key in keys:
+                self.session.dataset(groupname, key)
+
+        if self.swmr:
+            self.file.swmr_mode = True
+        self.last_flush = time.monotonic()
+
+        logging.debug(f"Opened {self.full_path} for writing")
 
     def close_file(self):
-        """Close the file."""
-        self.file.close()
+        """Trim every dataset written to down to the data it holds, then close the file."""
+        if self.file:
+            self.session.trim()
+            self.file.close()
+            logging.debug(f"Closed {self.full_path}")
+        self.session = None
 
     def write_hdf5(self, data, groupname):
         """Create or access a specified file, create a group in it and add data to that group.
-        :param filepath: path to file/file directory
-        :param filename: name of file
+        Datasets are created as needed, with float dtype unless specified in self.dtypes.
         :param data: dict of data, with each dataset as key and its data as value
         :param groupname: name of group for file
         """
         if not self.file:
             self.open_file()
-        # Add group to file
-        group = self.file.require_group(groupname)
 
-        for key, values in data.items():
+        self.session.append(groupname, data)
+
+        # Make new data visible to SWMR readers, and recoverable if the file is never closed
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def read_dataset(self, groupname, key):
+        """Read back the rows written to a dataset of the open file, e.g. a table to be added to.
+        :param groupname: name of group holding the dataset
+        :param key: name of the dataset
+        :return: array of the rows written, empty if the dataset does not exist
+        """
+        if key not in self.file.get(groupname, {}):
+            return np.empty(0, dtype=self._resolve_dtype(key))
+        handle = self.session.dataset(groupname, key)
+        return handle.dset[:handle.length]
+
+    def flush(self):
+        """Record the rows written to each dataset and flush the file to disk."""
+        self.session.record_lengths()
+        self.file.flush()
+        self.last_flush = time.monotonic()
 
-            values = [values] if not isinstance(values, (list, tuple, np.ndarray)) else values
-
-            # Create array with dtype. If no dtypes specified, defaults to float in all cases
-            if self.dtypes and key in self.dtypes:
-                dtype = self.dtypes.get(key, 'f')
-                if dtype == "str":
-                    dtype = h5py.string_dtype(encoding='utf-8')
-                new_data = np.array(values, dtype=dtype)
-            else:
-                new_data = np.array(values, dtype='f')
-
-            if key in group:
-                dset = group[key]
-                size_orig = dset.shape[0]
-                size_new = size_orig + len(values)
-                dset.resize(size_new, axis=0)
-                dset[size_orig:size_new] = new_data
-
-            else:
-                maxshape = (None,) + new_data.shape[1:]
-                group.create_dataset(key, data=new_data, maxshape=maxshape, dtype=new_data.dtype)
-
-        logging.debug(f"File written to {self.full_path}")
+    def _resolve_dtype(self, key):
+        """Get the dtype a dataset is written with: float, unless specified in self.dtypes."""
+        dtype = 'f'
+        if self.dtypes and key in self.dtypes:
+            dtype = self.dtypes.get(key, 'f')
+            if dtype == "str":
+                dtype = h5py.string_dtype(encoding='utf-8')
+        return np.dtype(dtype)
+
+    def _create_dataset(self, group, key, dtype, row_shape=()):
+        """Create an empty, extendable dataset in a group using the options set for that group.
+        :param group: h5py group to create the dataset in
+        :param key: name of the dataset
+        :param dtype: dtype of the dataset
+        :param row_shape: shape of each row, for datasets of more than one dimension
+        """
+        options = self.group_options.get(group.name.lstrip('/'), {})
+        rows = options.get('chunks')
+        compression = options.get('compression')
+
+        # SWMR datasets start empty, others with room for at least one chunk
+        capacity = 0 if self.swmr else (rows or 1)
+        return group.create_dataset(
+            key,
+            shape=(capacity,) + row_shape,
+            maxshape=(None,) + row_shape,
+            dtype=dtype,
+            chunks=(rows,) + row_shape if rows else True,
+            compression=compression,
+            compression_opts=options.get('compression_opts'),
+            shuffle=bool(compression)
+        )
 
     def create_notes_file(filepath, filename, filetype='md'):
         """Create a notes file in the specified location, with specified name and filetype.
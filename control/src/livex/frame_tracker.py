@@ -0,0 +1,108 @@
+import numpy as np
+
+# One record per discontinuity in the frame counter of the data written to file
+GAP_DTYPE = np.dtype([
+    ('row', 'i8'),  # Row of the first packet written after the gap, counted from the last reset
+    ('frame', 'i8'),  # Frame of that packet
+    ('missing', 'i8')  # Frames absent from the file before it, lost in the stream or dropped
+])
+
+class FrameTracker():
+    """Class to check the continuity of the frame counter across batches of stream packets.
+
+    Batches are checked as they are passed to the file writer, with update for those written and
+    drop for those the writer had no room for. Every packet should carry a frame one higher than
+    the highest seen before it. Anything else is counted: a jump forward as missing frames, a
+    repeat of the highest frame as a duplicate, and a frame lower than the highest as out of order.
+    Frames absent from the file, whether missing from the stream or dropped, are recorded as a gap
+    at the next row written, so that the gap records match the rows of the file. Each batch is
+    checked with array operations rather than packet by packet.
+    """
+
+    def __init__(self):
+        """Initialise the tracker with zeroed counters."""
+        self.reset()
+
+    def reset(self):
+        """Zero the counters and forget the previous frame, e.g. at the start of an acquisition."""
+        self.highest_frame = None
+        self.received = 0
+        self.written = 0  # Packets passed to update, i.e. rows of the file
+        self.missing = 0  # Frames missing from the stream
+        self.dropped = 0  # Packets dropped before being written
+        self.duplicated = 0
+        self.out_of_order = 0
+        self.unrecorded = 0  # Frames absent from the file since the last row written
+        self.gaps = []  # Gap records not yet taken to be written
+
+    def _check(self, frames):
+        """Count the frames of a batch against the highest frame seen before each one.
+        :param frames: array of frame counters, in the order the packets were received
+        :return: array of the step from the highest previous frame to each frame
+        """
+        previous = frames[0] - 1 if self.highest_frame is None else self.highest_frame
+        # Highest frame seen before each packet
+        highest = np.maximum.accumulate(np.concatenate(([previous], frames[:-1])))
+        steps = frames - highest
+
+        self.missing += int(np.sum(steps[steps > 1] - 1))
+        self.duplicated += int(np.count_nonzero(steps == 0))
+        self.out_of_order += int(np.count_nonzero(steps < 0))
+        self.received += frames.size
+        self.highest_frame = max(int(highest[-1]), int(frames[-1]))
+        return steps
+
+    def update(self, frames):
+        """Check a batch of frames written to file, following on from the previous batch.
+        :param frames: array of frame counters, in the order the packets were received
+        :return: number of gaps found before and in this batch
+        """
+        frames = np.asarray(frames).astype(np.int64)
+        if not frames.size:
+            return 0
+
+        steps = self._check(frames)
+        gap_index = np.flatnonzero(steps > 1)
+        missing = steps[gap_index] - 1
+        if self.unrecorded:
+            # Frames dropped since the last row written are absent before this batch's first row
+            if not gap_index.size or gap_index[0] != 0:
+                gap_index = np.concatenate(([0], gap_index))
+                missing = np.concatenate(([0], missing))
+            missing[0] += self.unrecorded
+            self.unrecorded = 0
+
+        if gap_index.size:
+            gaps = np.empty(gap_index.size, dtype=GAP_DTYPE)
+            gaps['row'] = self.written + gap_index
+            gaps['frame'] = frames[gap_index]
+            gaps['missing'] = missing
+            self.gaps.append(gaps)
+
+        self.written += frames.size
+        return gap_index.size
+
+    def drop(self, frames):
+        """Check a batch of frames dropped instead of written to file.
+        The frames it covers are recorded in the gap before the next batch written. If nothing is
+        written after it, they are only counted.
+        :param frames: array of frame counters, in the order the packets were received
+        """
+        frames = np.asarray(frames).astype(np.int64)
+        if not frames.size:
+            return
+
+        previous = frames[0] - 1 if self.highest_frame is None else self.highest_frame
+        self._check(frames)
+        self.dropped += frames.size
+        self.unrecorded += max(self.highest_frame - int(previous), 0)
+
+    def take_gaps(self):
+        """Take the gap records found since the last call.
+        :return: array of GAP_DTYPE records, or None if there are none
+        """
+        if not self.gaps:
+            return None
+        gaps = np.concatenate(self.gaps)
+        self.gaps = []
+        return gaps
@@ -1,6 +1,7 @@
 import logging
 import time
 import socket
+import threading
 from concurrent import futures
 from functools import partial
 
@@ -16,12 +17,25 @@ from livex.furnace.controls.autoSetPointControl import AutoSetPointControl
 from livex.furnace.controls.thermocoupleManager import ThermocoupleManager
 
 from livex.modbusAddresses import modAddr
-from livex.filewriter import FileWriter
+from livex.filewriter import FileWriter, parse_group_options
+from livex.queued_filewriter import QueuedFileWriter
 from livex.util import LiveXError
-from livex.util import read_decode_input_reg, read_decode_holding_reg, write_modbus_float, write_coil
+from livex.util import write_modbus_float, write_coil
 from livex.packet_decoder import LiveXPacketDecoder
-
-from livex.mockModbusClient import MockModbusClient, MockPLC, MockTCPClient
+from livex.stream_reassembler import StreamReassembler
+from livex.stream_buffer import StreamBuffer
+from livex.event_store import EventStore, EVENT_DTYPE
+from livex.frame_tracker import FrameTracker, GAP_DTYPE
+from livex.receive_clock import ReceiveClock
+from livex.stream_reader import IOStreamReader
+from livex.register_map import FURNACE_REGISTERS
+from livex.write_batch import BatchingClient
+from livex.register_cache import CachingClient
+from livex.command_queue import CommandQueue, QueuedClient, Priority
+from livex.poll_scheduler import PollGroup, PollScheduler
+
+from livex.mockModbusClient import MockModbusClient, MockPLC, MockTCPClient, MockStreamSource
+from livex.thermal_sim import SimulatedPLC
 
 class FurnaceController():
     """FurnaceController - class that communicates with a modbus server on a PLC to drive a furnace."""
@@ -37,6 +51,9 @@ class FurnaceController():
         # Parse options
         self.bg_read_task_enable = bool(int(options.get('background_read_task_enable', False)))
         self.bg_read_task_interval = float(options.get('background_read_task_interval', 1.0))
+        poll_max_interval = float(options.get('poll_max_interval', 5.0))
+        poll_static_cycles = int(options.get('poll_static_cycles', 10))
+        poll_static_tolerance = float(options.get('poll_static_tolerance', 0.1))
 
         self.bg_stream_task_enable = bool(int(options.get('background_stream_task_enable', False)))
         self.pid_frequency = int(options.get('pid_frequency', 50))
@@ -62,12 +79,36 @@ class FurnaceController():
 
         self.ip = options.get('ip', '192.168.0.159')
         self.port = int(options.get('port', '4444'))
+        # Modbus port, e.g. to use livex.plc_simulator on an unprivileged port
+        self.modbus_port = int(options.get('modbus_port', 502))
 
         self.tc_indices = options.get('thermocouple_indices', '0,1,2,3,4,5')
         self.tc_indices = [int(val) for val in self.tc_indices.strip(" ").split(",")]
 
         self.mocking = bool(int(options.get('use_mock_client', 0)))
+        # Mock furnace: 'simple' (MockPLC, upper heater only) or 'thermal' (SimulatedPLC)
+        self.mock_plc = str(options.get('mock_plc', 'simple')).strip().lower()
+        # When mocking, a stream at mock_stream_rate packets per second (0 for one packet per read)
+        # in bursts, with reads cut short and frames dropped, to stress the stream path
+        self.mock_stream_rate = float(options.get('mock_stream_rate', 0))
+        self.mock_stream_pattern = {
+            'burst': int(options.get('mock_stream_burst', 1)),
+            'max_read': int(options.get('mock_stream_max_read', 0)) or None,
+            'drop_rate': float(options.get('mock_stream_drop_rate', 0))
+        }
+        # Values read or written within this many seconds are not read again from the PLC
+        self.register_cache_ttl = float(options.get('register_cache_ttl', 1.0))
+        # Stream is read by a polling thread, or from the IOLoop as data arrives ('ioloop')
+        self.stream_reader_mode = str(options.get('stream_reader', 'thread')).strip().lower()
+        if self.stream_reader_mode not in ('thread', 'ioloop'):
+            logging.warning(f"Unknown stream_reader {self.stream_reader_mode}. Defaulting to thread.")
+            self.stream_reader_mode = 'thread'
+        if self.mocking and self.stream_reader_mode == 'ioloop':
+            logging.warning("Mock TCP client cannot be read from the IOLoop. Defaulting to thread.")
+            self.stream_reader_mode = 'thread'
         pid_debug = bool(int(options.get('pid_debug', 0)))
+        # While acquiring, take PID values from the stream instead of polling them over modbus
+        self.stream_live_values = bool(int(options.get('stream_live_values', 0)))
 
         # File name and directory is a default that is later overwritten by metadata
         self.log_directory = options.get('log_directory', 'logs')
@@ -93,13 +134,29 @@ class FurnaceController():
         # Set the background task counters to zero
         self.background_thread_counter = 0
 
+        # Chunk size (rows) and compression filter can be set for each group in the file
+        group_options = parse_group_options(
+            compression=options.get('hdf_compression', ''),
+            chunks=options.get('hdf_chunks', '')
+        )
+        # In SWMR mode, the file can be read by other processes while it is being written
+        hdf_swmr = bool(int(options.get('hdf_swmr', 0)))
+        hdf_flush_interval = float(options.get('hdf_flush_interval', 1.0))
         self.file_writer = FileWriter(self.log_directory, self.log_filename, 
-            dtypes={'timestamps': 'S', 'key': 'str', 'event_frame': 'str', 'event_key': 'str', 'event_value': 'str'}
+            dtypes={'host_monotonic': 'f8', 'host_time': 'f8', 'key': 'str',
+                'events': EVENT_DTYPE, 'event_keys': 'str', 'event_strings': 'str',
+                'frame_gaps': GAP_DTYPE},
+            group_options=group_options, swmr=hdf_swmr, flush_interval=hdf_flush_interval
         )
         
         # File is not open by default in case of multiple acquisitions per software run
         self.file_open_flag = False
 
+        # Data is written to file from a separate thread, so that slow writes do not hold up the
+        # stream task. Batches are dropped if more than max_write_queue are waiting to be written
+        max_write_queue = int(options.get('max_write_queue', 8))
+        self.write_queue = QueuedFileWriter(self.file_writer, max_queue=max_write_queue)
+
         self.tcp_reading = None
 
         # Create packet decoder and stream buffer for TCP values sent by PLC
@@ -107,8 +164,29 @@ class FurnaceController():
         data_groupname = str(options.get('data_groupname', 'fast_data'))
 
         self.packet_decoder = LiveXPacketDecoder(pid_debug=pid_debug)
-        self.stream_buffer= {key: [] for key in self.packet_decoder.data.keys()}  # Same data structure
-        self.event_buffer = []
+        # Receive buffer for the stream, sized to hold a second of packets
+        self.stream_reassembler = StreamReassembler(self.packet_decoder, int(self.buffer_size))
+        # Columns match the decoded data. Capacity is a second of data, written out when full
+        # Enough slots that one is always free while others are queued for or being written
+        self.stream_buffer_slots = max_write_queue + 3
+        self.stream_buffer = StreamBuffer(
+            {
+                **{key: 'f' for key in self.packet_decoder.keys},
+                'host_monotonic': 'f8', 'host_time': 'f8'
+            },
+            int(self.buffer_size), slots=self.stream_buffer_slots
+        )
+        # Host receive time of each packet, written to the data group with the stream data
+        self.receive_clock = ReceiveClock(1/self.pid_frequency)
+        self.stream_reader = IOStreamReader(
+            self.stream_reassembler, self._handle_packets, on_error=self._stream_reader_error
+        )
+        # Held while a batch is buffered/written, so that stopping cannot interleave with it
+        self.stream_lock = threading.Lock()
+        # Checks the frame counter of every packet for gaps, duplicates and reordering
+        self.frame_tracker = FrameTracker()
+        # Events (e.g. setpoint changes) are recorded as fixed-size records in a compound dataset
+        self.event_store = EventStore()
         self.data_groupname = data_groupname
 
         self.acquiring = False
@@ -119,12 +197,63 @@ class FurnaceController():
         self.gradient = Gradient(modAddr.gradient_addresses, self)
         self.aspc = AutoSetPointControl(modAddr.aspc_addresses, max_autosp_rate, self)
 
+        # Values polled by the background read task, in groups read at their own rates. Each group
+        # is fetched in as few block reads as possible, and read at the task interval while its
+        # rule holds or its values are changing, slowing down to poll_max_interval when static
+        heating = lambda: (
+            self.acquiring or self.pid_upper.enable or self.pid_lower.enable
+            or self.gradient.enable or self.aspc.enable
+        )
+        # Outputs and setpoints are only in the stream in debug mode
+        streamed = lambda: self.streaming_live_values and self.packet_decoder.pid_debug
+        self.poll_scheduler = PollScheduler([
+            PollGroup('temperatures', FURNACE_REGISTERS.block_reader({
+                **{f'thermocouple_{i}': tc.val_addr for i, tc in enumerate(self.tc_manager.thermocouples)},
+                'counter': modAddr.counter_inp
+            }), poll_max_interval, fast_when=heating, static_cycles=poll_static_cycles,
+                tolerance=poll_static_tolerance, ignore=('counter',)),
+            PollGroup('outputs', FURNACE_REGISTERS.block_reader({
+                'pid_upper_output': modAddr.pid_upper_output_inp,
+                'pid_lower_output': modAddr.pid_lower_output_inp,
+                'pid_upper_outputsum': modAddr.pid_upper_outputsum_inp,
+                'pid_lower_outputsum': modAddr.pid_lower_outputsum_inp
+            }), poll_max_interval, fast_when=heating, static_cycles=poll_static_cycles,
+                tolerance=poll_static_tolerance, pause_when=streamed),
+            PollGroup('gradient', FURNACE_REGISTERS.block_reader({
+                'gradient_actual': modAddr.gradient_actual_inp,
+                'gradient_theory': modAddr.gradient_theory_inp,
+                'autosp_midpt': modAddr.autosp_midpt_inp
+            }), poll_max_interval, fast_when=lambda: self.gradient.enable or self.aspc.enable,
+                static_cycles=poll_static_cycles, tolerance=poll_static_tolerance),
+            # Setpoints change by themselves under auto set point control
+            PollGroup('setpoints', FURNACE_REGISTERS.block_reader({
+                'pid_upper_setpoint': modAddr.pid_setpoint_upper_hold,
+                'pid_lower_setpoint': modAddr.pid_lower_setpoint_hold
+            }), poll_max_interval, fast_when=lambda: self.aspc.enable,
+                static_cycles=poll_static_cycles, pause_when=streamed),
+            PollGroup('limits', FURNACE_REGISTERS.block_reader({
+                'setpoint_limit': modAddr.setpoint_limit_hold,
+                'setpoint_step': modAddr.setpoint_step_hold
+            }), poll_max_interval, static_cycles=poll_static_cycles)
+        ], self.bg_read_task_interval)
+
+        # Modbus requests from every thread are run one at a time, in order of priority
+        self.command_queue = CommandQueue()
         self._initialise_clients(value=None)
 
         self.lifetime_counter = 0
 
         self.bg_task_subtree = ParameterTree({
             'thread_count': (lambda: self.background_thread_counter, None),
+            'round_trips': (lambda: self.poll_scheduler.round_trips, None),
+            'read_duration': (lambda: self.poll_scheduler.duration, None),
+            'rates': self.poll_scheduler.rates_tree(),
+            'cache_hits': (lambda: self.mod_client.cache.hits, None),
+            'cache_misses': (lambda: self.mod_client.cache.misses, None),
+            'command_queue': {
+                'depth': (lambda: self.command_queue.depth, None),
+                **self.command_queue.stats_tree()
+            },
             'enable': (lambda: self.bg_read_task_enable, self.set_task_enable),
             'interval': (lambda: self.bg_read_task_interval, self.set_task_interval),
         })
@@ -139,6 +268,17 @@ class FurnaceController():
 
         self.tcp_subtree = ParameterTree({
             'tcp_reading': (lambda: self.tcp_reading, None),
+            'live_values': (lambda: self.stream_live_values, self._set_stream_live_values),
+            'received_bytes': (lambda: self.stream_reassembler.received_bytes, None),
+            'discarded_bytes': (lambda: self.stream_reassembler.discarded_bytes, None),
+            'resync_count': (lambda: self.stream_reassembler.resync_count, None),
+            'frames': {
+                'received': (lambda: self.frame_tracker.received, None),
+                'missing': (lambda: self.frame_tracker.missing, None),
+                'dropped': (lambda: self.frame_tracker.dropped, None),
+                'duplicated': (lambda: self.frame_tracker.duplicated, None),
+                'out_of_order': (lambda: self.frame_tracker.out_of_order, None)
+            },
             'acquire': (lambda: self.acquiring, self.solo_acquisition)
         })
 
@@ -179,7 +319,13 @@ class FurnaceController():
             'tcp': self.tcp_subtree,
             'filewriter': {
                 'filepath': (lambda: self.file_writer.filepath, self._set_filepath),
-                'filename': (lambda: self.file_writer.filename, self._set_filename)
+                'filename': (lambda: self.file_writer.filename, self._set_filename),
+                'queue_depth': (lambda: self.write_queue.queue_depth, None),
+                'write_latency': (lambda: self.write_queue.write_latency, None),
+                'max_write_latency': (lambda: self.write_queue.max_write_latency, None),
+                'written_batches': (lambda: self.write_queue.written_batches, None),
+                'failed_batches': (lambda: self.write_queue.failed_batches, None),
+                'dropped_batches': (lambda: self.write_queue.dropped_batches, None)
             },
             'thermocouples': self.tc_manager.tree
         })
@@ -212,6 +358,7 @@ class FurnaceController():
         self.mod_client.close()
         self.tcp_client.close()
         self._stop_background_tasks()
+        self.command_queue.close()
 
     def get(self, path, with_metadata=False):
         """Get parameter data from controller.
@@ -256,9 +403,14 @@ class FurnaceController():
         self.file_writer.set_fullpath()
 
     def stop_all_pid(self, value=None):
-        """Disable all/both PIDs, setting their gpio output to 0. Acts as an 'emergency stop'."""
-        self.pid_upper.set_enable(False)
-        self.pid_lower.set_enable(False)
+        """Disable all/both PIDs, setting their gpio output to 0. Acts as an 'emergency stop'.
+        The writes go ahead of any other requests waiting for the modbus client, but still wait
+        for a request already being sent to finish (up to the client timeout if the PLC is slow
+        to answer), so they do not take effect instantly.
+        """
+        with self.command_queue.priority(Priority.EMERGENCY):
+            self.pid_upper.set_enable(False)
+            self.pid_lower.set_enable(False)
 
     # Data acquiring tasks
 
@@ -279,11 +431,29 @@ class FurnaceController():
             self.livex.stop_acquisition()
 
     def _start_acquisition(self):
-        """Start the acquisition process for the furnace control."""
+        """Start the acquisition process for the furnace control.
+        The file is opened first, so that if it cannot be the error is raised before the PLC is
+        told to send data.
+        """
+        # SWMR files need all their datasets created before readers are allowed in
+        layout = self._file_layout() if self.file_writer.swmr else None
+        self.write_queue.open_file(layout=layout)
+        self.file_open_flag = True
+        # Events added to an existing file index into the tables already in it
+        self.event_store.reset(
+            keys=self.write_queue.read_dataset("event_data", "event_keys"),
+            strings=self.write_queue.read_dataset("event_data", "event_strings")
+        )
+
         # Send signal to modbus to start writing data
         self.mod_client.write_coil(modAddr.acquisition_coil, 1, slave=1)
-        self.file_writer.open_file()
-        self.file_open_flag = True
+        self.packet_decoder.reset()
+        self.stream_reassembler.reset()
+        self.frame_tracker.reset()
+        self.receive_clock.reset()
+        if self.mocking and self.mock_stream_rate:
+            # The mock source keeps time while idle, so start it now as the PLC would
+            self.tcp_client.restart()
 
         # If you are starting the acquisition and the gradient is on, was_gradient_active should be
         # true for the benefit of the metadata
@@ -296,19 +466,28 @@ class FurnaceController():
         """End the acquisition process for the furnace control, writing out any remaining data."""
         # Tell PLC to stop sending data
         self.mod_client.write_coil(modAddr.acquisition_coil, 0, slave=1)
-
-        # Clear the buffer
-        self.file_writer.write_hdf5(
-            self.stream_buffer,
-            self.data_groupname
-        )
-        for key in self.stream_buffer:
-            self.stream_buffer[key].clear()
-
-        self.file_writer.close_file()
-        self.file_open_flag = False
-
-        self.acquiring = False
+        self._close_acquisition_file()
+
+    def _close_acquisition_file(self):
+        """Stop buffering stream data, then write out what remains and close the file if open."""
+        # Stop the stream task buffering data, then write out what remains in the buffer
+        with self.stream_lock:
+            self.acquiring = False
+            if self.file_open_flag:
+                self._write_stream_buffer(block=True)
+                self._write_frame_gaps(block=True)
+
+        if self.file_open_flag:
+            # Wait for the writer to drain its queue and close the file
+            self.write_queue.close_file()
+            self.file_open_flag = False
+
+    def write_batch(self):
+        """Get a context in which writes to the PLC are held and then sent together, e.g.
+        with furnace.write_batch(): to set several parameters in a sequence. If the block raises,
+        the writes held are not sent.
+        """
+        return self.mod_client.batch()
 
     def _initialise_clients(self, value):
         """Instantiate a ModbusTcpClient and provide it to the PID controllers."""
@@ -317,9 +496,19 @@ class FurnaceController():
         try:
             if self.mocking:
                 self.mod_client = MockModbusClient(self.ip, self.port, registers=MockModbusClient.furnace_registers)
-                self.mockClient = MockPLC(self.mod_client)
+                if self.mock_plc == 'thermal':
+                    self.mockClient = SimulatedPLC(self.mod_client)
+                else:
+                    self.mockClient = MockPLC(self.mod_client)
             else:
-                self.mod_client = ModbusTcpClient(self.ip)
+                self.mod_client = ModbusTcpClient(self.ip, port=self.modbus_port)
+            # Every request goes through the command queue, so only one thread uses the client.
+            # Writes made inside mod_client.batch() are sent together, and everything read or
+            # written is cached so that values just written are not read straight back
+            self.mod_client = CachingClient(
+                BatchingClient(QueuedClient(self.mod_client, self.command_queue)),
+                ttl=self.register_cache_ttl
+            )
             self.mod_client.connect()
             # With connection established, populate trees and provide correct connection
             self.pid_upper._register_modbus_client(self.mod_client)
@@ -328,11 +517,12 @@ class FurnaceController():
             self.aspc._register_modbus_client(self.mod_client)
             self.tc_manager._register_modbus_client(self.mod_client)
 
-            write_modbus_float(self.mod_client, self.max_setpoint_increase, modAddr.setpoint_step_hold)
-            write_modbus_float(self.mod_client, self.max_setpoint, modAddr.setpoint_limit_hold)
-            write_modbus_float(self.mod_client, self.power_output_scale_upper, modAddr.power_output_scale_upper)
-            write_modbus_float(self.mod_client, self.power_output_scale_lower, modAddr.power_output_scale_lower)
-            write_coil(self.mod_client, modAddr.setpoint_update_coil, True)
+            with self.mod_client.batch():
+                write_modbus_float(self.mod_client, self.max_setpoint_increase, modAddr.setpoint_step_hold)
+                write_modbus_float(self.mod_client, self.max_setpoint, modAddr.setpoint_limit_hold)
+                write_modbus_float(self.mod_client, self.power_output_scale_upper, modAddr.power_output_scale_upper)
+                write_modbus_float(self.mod_client, self.power_output_scale_lower, modAddr.power_output_scale_lower)
+                write_coil(self.mod_client, modAddr.setpoint_update_coil, True)
 
             self.connected = True
         except Exception as e:
@@ -345,8 +535,14 @@ class FurnaceController():
         """Initialise the tcp client."""
 
         if self.mocking:
-            # This class does almost nothing but does return some fake data without writing it
-            self.tcp_client = MockTCPClient(self.mockClient)
+            if self.mock_stream_rate:
+                self.tcp_client = MockStreamSource(
+                    self.mockClient, rate=self.mock_stream_rate, **self.mock_stream_pattern
+                )
+                self.tcp_client.settimeout(0.2)
+            else:
+                # This class does almost nothing but does return some fake data without writing it
+                self.tcp_client = MockTCPClient(self.mockClient)
         else:
             self.tcp_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.tcp_client.connect((self.ip, self.port))
@@ -355,6 +551,11 @@ class FurnaceController():
             activate = '1'
             self.tcp_client.send(activate.encode())
 
+            # Move an IOLoop reader over to the new connection
+            if self.stream_reader.reading:
+                self.stream_reader.stop()
+                self.stream_reader.start(self.tcp_client)
+
     def _close_tcp_client(self):
         """Safely end the TCP connection."""
         self.tcp_client.close()
@@ -373,6 +574,13 @@ class FurnaceController():
 
         # Update buffer size to remain 1/s
         self.buffer_size = self.pid_frequency
+        if not self.acquiring:
+            self.stream_reassembler = StreamReassembler(self.packet_decoder, int(self.buffer_size))
+            self.stream_reader.reassembler = self.stream_reassembler
+            self.stream_buffer = StreamBuffer(
+                self.stream_buffer.columns, int(self.buffer_size), slots=self.stream_buffer_slots
+            )
+        self.receive_clock.period = 1/self.pid_frequency
         # Update task period
         self.bg_stream_task_interval = (1/self.pid_frequency)/2
 
@@ -380,23 +588,172 @@ class FurnaceController():
         write_coil(self.mod_client, modAddr.freq_aspc_update_coil, True)
     
     def add_event(self, key, value):
-        """Add an event to the event data buffer to be written out later.
+        """Add an event to the event store to be written out later.
         :param key: key of the new value
         :param value: the new value
         """
         if not self.acquiring:
             return
+        # Frame may be unavailable, e.g. set a parameter right after acq start. Stored as -1
         frame = self.packet_decoder.data['frame']
-        # If the frame is unavailable for some reason - e.g. set a parameter right after acq start
-        if frame is None:
-            frame = 'unknown'
-        # event_values are strings as you cannot have multiple data types in one field
-        # event_frames are strings to allow for obvious 'unknown' instead of -1
-        # Careful handling of the event data is required anyway so this is not burdensome to parse
-        self.event_buffer.append(
-            {'event_frame': str(frame), 'event_key': key, 'event_value': str(value)}
+        self.event_store.add(key, value, frame=frame)
+
+    def _buffer_stream_batch(self, batch):
+        """Copy a decoded batch into the stream buffer, writing the buffer out each time it fills.
+        Slow data and events are written alongside each full buffer, i.e. about once per second.
+        :param batch: dict of column arrays from the packet decoder
+        """
+        count = len(batch['frame'])
+        added = 0
+        while added < count:
+            added += self.stream_buffer.extend(batch, start=added)
+            if self.stream_buffer.full:
+                self._write_stream_buffer()
+                self._write_secondary_data()
+
+    def _write_stream_buffer(self, block=False):
+        """Queue the data held in the stream buffer to be written out.
+        The buffer slot is freed to be filled again once the writer thread is done with it.
+        :param block: wait for space in the write queue rather than dropping the data
+        """
+        swapped = self.stream_buffer.swap()
+        if swapped is None:
+            # Every slot is still waiting to be written, so this data has nowhere to go
+            self.frame_tracker.drop(self.stream_buffer.view()['frame'])
+            self.stream_buffer.clear()
+            self.write_queue.record_dropped()
+            logging.warning("No free stream buffer, dropped data")
+            return
+
+        slot, data = swapped
+        # The frames are checked as they are passed on, so that gaps match the rows of the file.
+        # The slot is only refilled by this thread, so its frames can be read after queueing
+        if self.write_queue.write_hdf5(
+            data=data,
+            groupname=self.data_groupname,
+            on_written=partial(self.stream_buffer.release, slot),
+            block=block
+        ):
+            gaps = self.frame_tracker.update(data['frame'])
+            if gaps:
+                logging.debug(f"{gaps} gap(s) in stream frames, {self.frame_tracker.missing} frames missing in total")
+        else:
+            self.frame_tracker.drop(data['frame'])
+
+    def _extra_thermocouples(self):
+        """Get the enabled thermocouples recorded in slow data, not including a or b (0,1)."""
+        return [
+            tc for tc in self.tc_manager.thermocouples[2:self.tc_manager.num_mcp]
+            if tc.index is not None and tc.index >= 0
+        ]
+
+    def _file_layout(self):
+        """Get the groups and datasets written to during an acquisition."""
+        slow_keys = ['frame', 'setpoint_upper', 'setpoint_lower', 'output_upper', 'output_lower']
+        slow_keys += [f'thermocouple_{tc.label}' for tc in self._extra_thermocouples()]
+        return {
+            self.data_groupname: list(self.stream_buffer.columns),
+            'slow_data': slow_keys,
+            'event_data': ['events', 'event_keys', 'event_strings'],
+            'diagnostics': ['frame_gaps']
+        }
+
+    def _write_secondary_data(self):
+        """Write out data recorded at a lower frequency than the stream, and any new events."""
+        # Additional information written at a lower frequency
+        secondary_data = {
+            'frame': [self.packet_decoder.data['frame']],
+            'setpoint_upper': [self.pid_upper.setpoint],
+            'setpoint_lower': [self.pid_lower.setpoint],
+            'output_upper': [self.pid_upper.output],
+            'output_lower': [self.pid_lower.output]
+        }
+        # Include additional thermocouples if enabled, not including a or b (0,1)
+        for tc in self._extra_thermocouples():
+            data_label = f'thermocouple_{tc.label}'
+            secondary_data[data_label] = [tc.value]
+
+        self.write_queue.write_hdf5(
+            data=secondary_data,
+            groupname="slow_data"
         )
 
+        # Write out new events once per second too, along with any new entries in their key and
+        # string tables. If the write queue is full, keep them for next time
+        events = self.event_store.take()
+        if events and not self.write_queue.write_hdf5(data=events, groupname="event_data"):
+            self.event_store.restore(events)
+
+        self._write_frame_gaps()
+
+    def _write_frame_gaps(self, block=False):
+        """Write out any gaps found in the frame counter since the last write.
+        Each gap records the stream row after it, the frame of that row and the frames missed.
+        :param block: wait for space in the write queue rather than dropping the gaps
+        """
+        gaps = self.frame_tracker.take_gaps()
+        if gaps is not None:
+            self.write_queue.write_hdf5(
+                data={'frame_gaps': gaps},
+                groupname="diagnostics",
+                block=block
+            )
+
+    def _handle_packets(self, packets):
+        """Decode whole packets from the stream and add them to the stream buffer.
+        The stream buffer is written out as it fills.
+        :param packets: bytes of zero or more whole packets from the stream reassembler
+        """
+        batch = self.packet_decoder.unpack_batch(packets)
+        batch.update(self.receive_clock.stamp(len(batch['frame'])))
+
+        if not self.mocking:
+            logging.debug(self.packet_decoder.data['frame'])
+        else:
+            logging.debug(f"Mock acquisition data: frame {self.packet_decoder.data['frame']}, temperature_upper {self.packet_decoder.data['temperature_upper']}")
+
+        self.tcp_reading = self.packet_decoder.data
+        if self.streaming_live_values and len(batch['frame']):
+            self._update_live_values(self.tcp_reading)
+
+        with self.stream_lock:
+            if self.acquiring:
+                self._buffer_stream_batch(batch)
+
+    @property
+    def streaming_live_values(self):
+        """Whether PID values are currently taken from the stream rather than polled."""
+        return self.stream_live_values and self.acquiring
+
+    def _set_stream_live_values(self, value):
+        """Set whether PID values are taken from the stream while acquiring."""
+        self.stream_live_values = bool(value)
+
+    def _update_live_values(self, reading):
+        """Set the PID values from the latest packet in the stream.
+        :param reading: dict of the latest decoded packet values
+        """
+        self.pid_upper.temperature = reading['temperature_upper']
+        self.pid_lower.temperature = reading['temperature_lower']
+        if self.packet_decoder.pid_debug:
+            self.pid_upper.output    = reading['output_upper']
+            self.pid_lower.output    = reading['output_lower']
+
+            self.pid_upper.outputsum = reading['outputSum_upper']
+            self.pid_lower.outputsum = reading['outputSum_lower']
+
+            self.pid_upper.setpoint  = reading['setpoint_upper']
+            self.pid_lower.setpoint  = reading['setpoint_lower']
+
+    def _stream_reader_error(self, error):
+        """Halt the background tasks if the IOLoop stream reader loses the connection.
+        This runs on the IOLoop, and stopping waits for the file writer to drain its queue and
+        close the file, so it is done in the thread executor instead.
+        """
+        logging.debug(f"Other TCP error: {str(error)}")
+        logging.debug("Halting background tasks")
+        self.executor.submit(self._stop_background_tasks)
+
     @run_on_executor
     def background_stream_task(self):
         """Instruct the packet decoder to receive an object, then put that object
@@ -404,16 +761,11 @@ class FurnaceController():
         """
         while self.bg_stream_task_enable:
             if self.acquiring:
+                packets = None
                 try:
-                    reading = self.tcp_client.recv(self.packet_decoder.size)
-                    
-                    # Decode the reading using packet decoder
-                    self.tcp_reading = self.packet_decoder.unpack(reading)
-                    
-                    if not self.mocking:
-                        logging.debug(self.packet_decoder.data['frame'])
-                    else:
-                        logging.debug(f"Mock acquisition data: frame {self.packet_decoder.data['frame']}, temperature_upper {self.packet_decoder.data['temperature_upper']}")
+                    # Receive into the reassembler, which only returns whole packets. The PLC can
+                    # send several at once, and TCP can split them across reads
+                    packets = self.stream_reassembler.recv(self.tcp_client)
 
                 except socket.timeout:
                     if not self.mocking:
@@ -430,57 +782,12 @@ class FurnaceController():
                     else:
                         logging.debug(f"Mock TCP error: {e}")
 
-                self.tcp_reading = self.packet_decoder.data
-
-                # Add decoded data to the stream buffer
-                for attr in self.packet_decoder.data.keys():
-                    self.stream_buffer[attr].append(self.packet_decoder.data[attr])
-
-                # After a certain number of data reads, write data to the file
-                if len(self.stream_buffer['frame']) >= self.pid_frequency:
-                    self.file_writer.write_hdf5(
-                        data=self.stream_buffer,
-                        groupname=self.data_groupname
-                    )
-                    # Then clear the stream buffer
-                    for key in self.stream_buffer:
-                        self.stream_buffer[key].clear()
-
-                    # Additional information written at a lower frequency
-                    secondary_data = {
-                        'frame': [self.packet_decoder.data['frame']],
-                        'setpoint_upper': [self.pid_upper.setpoint],
-                        'setpoint_lower': [self.pid_lower.setpoint],
-                        'output_upper': [self.pid_upper.output],
-                        'output_lower': [self.pid_lower.output]
-                    }
-                    # Include additional thermocouples if enabled, not including a or b (0,1)
-                    for tc in self.tc_manager.thermocouples[2:self.tc_manager.num_mcp]:
-                        if tc.index is not None and tc.index >= 0:
-                            data_label = f'thermocouple_{tc.label}'
-                            secondary_data[data_label] = [tc.value]
-
-                    self.file_writer.write_hdf5(
-                        data=secondary_data,
-                        groupname="slow_data"
-                    )
-
-                    # Write out the event buffer once per second too
-                    # List-of-dicts format won't work, so convert it to dict-of-lists
-                    if self.event_buffer:
-                        batch = {
-                            "event_frame": [e["event_frame"] for e in self.event_buffer],
-                            "event_key":   [e["event_key"]   for e in self.event_buffer],
-                            "event_value": [e["event_value"] for e in self.event_buffer]
-                        }
-                        self.file_writer.write_hdf5(
-                            data=batch,
-                            groupname="event_data"
-                        )
-                        self.event_buffer.clear()
+                if packets is not None:
+                    self._handle_packets(packets)
 
             # Sleep interval - shorter for mocking to avoid it going too fast
-            if self.mocking:
+            # A mock stream source keeps its own time, so is read as the PLC would be
+            if self.mocking and not self.mock_stream_rate:
                 time.sleep(1/self.pid_frequency)
             else:
                 time.sleep(self.bg_stream_task_interval)
@@ -493,59 +800,71 @@ class FurnaceController():
         incrementing its counter once per loop, until the background task enable is set to false.
         """
         while self.bg_read_task_enable:
-
             if self.connected:
-                if self.mocking:
-                    self.mockClient.bg_temp_task()
-                # Get any value updated by the device
-                # Mostly input registers, except for setpoints which can change automatically
-                try:
-                    for tc in self.tc_manager.thermocouples[:self.tc_manager.num_mcp]:
-                        if tc.index is not None and tc.index>=0:
-                            value = read_decode_input_reg(
-                                self.mod_client, tc.val_addr
-                            )
-                            tc.value = value
+                self._background_read()
+            time.sleep(self.bg_read_task_interval)
 
-                    self.pid_upper.temperature = self.tc_manager._get_value_by_label('upper_heater')
-                    self.pid_lower.temperature = self.tc_manager._get_value_by_label('lower_heater')
+        logging.debug("Background thread task stopping")
+
+    def _background_read(self):
+        """Poll the values due to be read from the PLC, and update the parameter tree with them.
+        Run once per loop of the background read task.
+        """
+        if self.mocking:
+            self.mockClient.bg_temp_task()
+        # Get any value updated by the device
+        # Mostly input registers, except for setpoints which can change automatically
+        try:
+            # Polling gives way to any user or emergency requests waiting for the client
+            with self.command_queue.priority(Priority.BACKGROUND):
+                groups = self.poll_scheduler.poll(self.mod_client)
 
-                    self.lifetime_counter = read_decode_input_reg(self.mod_client, modAddr.counter_inp)
+            if 'temperatures' in groups:
+                values = groups['temperatures']
+                for i, tc in enumerate(self.tc_manager.thermocouples[:self.tc_manager.num_mcp]):
+                    if tc.index is not None and tc.index>=0:
+                        tc.value = values[f'thermocouple_{i}']
 
-                    self.pid_upper.output    = read_decode_input_reg(self.mod_client, modAddr.pid_upper_output_inp)
-                    self.pid_lower.output    = read_decode_input_reg(self.mod_client, modAddr.pid_lower_output_inp)
+                if not self.streaming_live_values:
+                    self.pid_upper.temperature = self.tc_manager._get_value_by_label('upper_heater')
+                    self.pid_lower.temperature = self.tc_manager._get_value_by_label('lower_heater')
 
-                    self.pid_upper.outputsum = read_decode_input_reg(self.mod_client, modAddr.pid_upper_outputsum_inp)
-                    self.pid_lower.outputsum = read_decode_input_reg(self.mod_client, modAddr.pid_lower_outputsum_inp)
+                self.lifetime_counter = values['counter']
 
-                    self.gradient.actual      = read_decode_input_reg(self.mod_client, modAddr.gradient_actual_inp)
-                    self.gradient.theoretical = read_decode_input_reg(self.mod_client, modAddr.gradient_theory_inp)
+            if 'outputs' in groups:
+                values = groups['outputs']
+                self.pid_upper.output    = values['pid_upper_output']
+                self.pid_lower.output    = values['pid_lower_output']
 
-                    self.aspc.midpt = read_decode_input_reg(self.mod_client, modAddr.autosp_midpt_inp)
+                self.pid_upper.outputsum = values['pid_upper_outputsum']
+                self.pid_lower.outputsum = values['pid_lower_outputsum']
 
-                    self.pid_upper.setpoint = read_decode_holding_reg(self.mod_client, modAddr.pid_setpoint_upper_hold)
-                    self.pid_lower.setpoint = read_decode_holding_reg(self.mod_client, modAddr.pid_lower_setpoint_hold)
+            if 'gradient' in groups:
+                values = groups['gradient']
+                self.gradient.actual      = values['gradient_actual']
+                self.gradient.theoretical = values['gradient_theory']
 
-                    self.max_setpoint = read_decode_holding_reg(self.mod_client, modAddr.setpoint_limit_hold)
-                    self.max_setpoint_increase = read_decode_holding_reg(self.mod_client, modAddr.setpoint_step_hold)
+                self.aspc.midpt = values['autosp_midpt']
 
-                except Exception as e:
-                    logging.error(f"error in reading: {e}")
-                    self.mod_client.close()
-                    self.tcp_client.close()
-                    # Close both for safety and consistency
-                    logging.debug("Modbus communication error, pausing reads")
-                    self.connected = False
+            if 'setpoints' in groups:
+                values = groups['setpoints']
+                self.pid_upper.setpoint = values['pid_upper_setpoint']
+                self.pid_lower.setpoint = values['pid_lower_setpoint']
 
-                self.background_thread_counter += 1
+            if 'limits' in groups:
+                values = groups['limits']
+                self.max_setpoint = values['setpoint_limit']
+                self.max_setpoint_increase = values['setpoint_step']
 
-            else:
-                # logging.debug("Awaiting reconnection")
-                pass
-            
-            time.sleep(self.bg_read_task_interval)
+        except Exception as e:
+            logging.error(f"error in reading: {e}")
+            self.mod_client.close()
+            self.tcp_client.close()
+            # Close both for safety and consistency
+            logging.debug("Modbus communication error, pausing reads")
+            self.connected = False
 
-        logging.debug("Background thread task stopping")
+        self.background_thread_counter += 1
 
     # Background tasks
 
@@ -563,6 +882,7 @@ class FurnaceController():
         """Set the background task interval."""
         logging.debug("Setting background task interval to %f", interval)
         self.bg_read_task_interval = float(interval)
+        self.poll_scheduler.base_interval = self.bg_read_task_interval
 
     def _start_background_tasks(self):
         """Start the background tasks."""
@@ -572,14 +892,21 @@ class FurnaceController():
         self.bg_read_task_enable = True
         self.bg_stream_task_enable = True
 
-        # Run the background thread task in the thread execution pool
-        self.background_stream_task()
+        # Run the background thread tasks in the thread execution pool
+        if self.stream_reader_mode == 'ioloop':
+            # The reader closes the socket when stopped, so reconnect if restarting
+            if self.tcp_client.fileno() == -1:
+                self._initialise_tcp_client()
+            self.stream_reader.start(self.tcp_client)
+        else:
+            self.background_stream_task()
         self.background_read_task()
 
     def _stop_background_tasks(self):
-        """Stop the background tasks."""
-        if self.file_open_flag:  # Ensure file is closed properly
-            self.file_writer.close_file()
+        """Stop the background tasks, ending any acquisition's file properly."""
+        self._close_acquisition_file()
 
         self.bg_read_task_enable = False
         self.bg_stream_task_enable = False
+        if self.stream_reader.reading:
+            self.stream_reader.stop()
@@ -1,5 +1,6 @@
 from odin.adapters.parameter_tree import ParameterTree
-from livex.util import read_coil, read_decode_input_reg, read_decode_holding_reg, write_modbus_float, write_coil
+from livex.util import read_coil, write_coil
+from livex.register_map import FURNACE_REGISTERS
 
 import logging
 
@@ -35,11 +36,14 @@ class AutoSetPointControl():
 
     def _get_parameters(self):
         """Get parameters for the parameter tree using a modbus connection."""
-        self.enable = read_coil(self.client, self.addresses['enable'])
-        self.heating = read_coil(self.client, self.addresses['heating'], asInt=True)
+        values = FURNACE_REGISTERS.read(self.client, {
+            key: self.addresses[key] for key in ('enable', 'heating', 'rate', 'midpt')
+        })
+        self.enable = values['enable']
+        self.heating = int(values['heating'])
         self.heating_options = self.addresses['heating_options']
-        self.rate = read_decode_holding_reg(self.client, self.addresses['rate'])
-        self.midpt = read_decode_input_reg(self.client, self.addresses['midpt'])
+        self.rate = values['rate']
+        self.midpt = values['midpt']
 
     def set_enable(self, value):
         """Set the enable boolean for the auto set point control."""
@@ -67,6 +71,7 @@ class AutoSetPointControl():
     def set_rate(self, value):
         """Set the rate value for the auto set point control."""
         self.rate = value
-        write_modbus_float(self.client, value, self.addresses['rate'])
-        write_coil(self.client, self.addresses['update'], 1)
+        FURNACE_REGISTERS.write(self.client, {
+            self.addresses['rate']: value, self.addresses['update']: True
+        })
         self.furnace_controller.add_event('autosp_rate', self.rate)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from odin.adapters.parameter_tree import ParameterTree
-from livex.util import read_coil, read_decode_input_reg, read_decode_holding_reg, write_modbus_float, write_coil
+from livex.util import read_coil, write_coil
+from livex.register_map import FURNACE_REGISTERS
 
 import logging
 
@@ -44,12 +45,15 @@ class Gradient():
 
     def _get_parameters(self):
         """Get parameters for the parameter tree using a modbus connection."""
-        self.enable       = bool(read_coil(self.client, self.addresses['enable']))
-        self.wanted       = read_decode_holding_reg(self.client, self.addresses['wanted'])
-        self.distance     = read_decode_holding_reg(self.client, self.addresses['distance'])
-        self.actual       = read_decode_input_reg(self.client, self.addresses['actual'])
-        self.theoretical  = read_decode_input_reg(self.client, self.addresses['theoretical'])
-        self.high         = read_coil(self.client, self.addresses['high'], asInt=True) # used as index for high-heater selection
+        values = FURNACE_REGISTERS.read(self.client, {
+            key: self.addresses[key] for key in ('enable', 'wanted', 'distance', 'actual', 'theoretical', 'high')
+        })
+        self.enable       = values['enable']
+        self.wanted       = values['wanted']
+        self.distance     = values['distance']
+        self.actual       = values['actual']
+        self.theoretical  = values['theoretical']
+        self.high         = int(values['high']) # used as index for high-heater selection
 
     def set_enable(self, value):
         """Set the enable value for the thermal gradient."""
@@ -67,24 +71,27 @@ class Gradient():
     def set_distance(self, value):
         """Set the distance value for the thermal gradient."""
         self.distance = value
-        write_modbus_float(self.client, value, self.addresses['distance'])
-        write_coil(self.client, self.addresses['update'], 1)
+        FURNACE_REGISTERS.write(self.client, {
+            self.addresses['distance']: value, self.addresses['update']: True
+        })
         self.furnace_controller.add_event('gradient_distance', self.distance)
 
     def set_wanted(self, value):
         """Set the desired temperature change per mm for the thermal gradient."""
         self.wanted = value
-        write_modbus_float(self.client, value, self.addresses['wanted'])
-        write_coil(self.client, self.addresses['update'], 1)
+        FURNACE_REGISTERS.write(self.client, {
+            self.addresses['wanted']: value, self.addresses['update']: True
+        })
         self.furnace_controller.add_event('gradient_wanted', self.wanted)
 
     def set_high(self, value):
         """Set the boolean for thermal gradient high heater."""
         self.high = value
 
+        values = {self.addresses['update']: True}
         if value =='Lower':  # 1, Lower heater
-            write_coil(self.client, self.addresses['high'], 1)
+            values[self.addresses['high']] = True
         elif value == 'Upper':  # 0, Upper heater
-            write_coil(self.client, self.addresses['high'], 0)
-        write_coil(self.client, self.addresses['update'], 1)
+            values[self.addresses['high']] = False
+        FURNACE_REGISTERS.write(self.client, values)
         self.furnace_controller.add_event('gradient_high', self.high)
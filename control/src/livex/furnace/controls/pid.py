@@ -1,5 +1,7 @@
 from odin.adapters.parameter_tree import ParameterTree
-from livex.util import read_coil, read_decode_input_reg, read_decode_holding_reg, write_modbus_float, write_coil, LiveXError
+from livex.util import read_coil, write_modbus_float, write_coil, LiveXError
+from livex.register_map import FURNACE_REGISTERS
+from livex.write_batch import batch
 import logging
 
 class PID():
@@ -81,15 +83,19 @@ class PID():
 
     def _get_parameters(self):
         """Get parameters for the parameter tree using a modbus connection."""
-        self.enable = bool(read_coil(self.client, self.addresses['enable']))
-        self.setpoint = read_decode_holding_reg(self.client, self.addresses['setpoint'])
+        values = FURNACE_REGISTERS.read(self.client, {
+            key: self.addresses[key]
+            for key in ('enable', 'setpoint', 'kp', 'ki', 'kd', 'output', 'outputsum', 'thermocouple')
+        })
+        self.enable = values['enable']
+        self.setpoint = values['setpoint']
         # PID term default display rounded for readability
-        self.kp = round(read_decode_holding_reg(self.client, self.addresses['kp']), 4)
-        self.ki = round(read_decode_holding_reg(self.client, self.addresses['ki']), 4)
-        self.kd = round(read_decode_holding_reg(self.client, self.addresses['kd']), 4)
-        self.output = read_decode_input_reg(self.client, self.addresses['output'])
-        self.outputsum = read_decode_input_reg(self.client, self.addresses['outputsum'])
-        self.temperature = read_decode_input_reg(self.client, self.addresses['thermocouple'])
+        self.kp = round(values['kp'], 4)
+        self.ki = round(values['ki'], 4)
+        self.kd = round(values['kd'], 4)
+        self.output = values['output']
+        self.outputsum = values['outputsum']
+        self.temperature = values['thermocouple']
 
     def _write_pid_defaults(self):
         """Write the default terms of the controller.
@@ -97,10 +103,11 @@ class PID():
         On PID class initialisation, this will be the defaults in the furnace details in livex.cfg.
         """
         logging.debug(f"defaults: {self.pid_defaults}")
-        self.set_setpoint(self.pid_defaults['setpoint'])
-        self.set_proportional(self.pid_defaults['kp'])
-        self.set_integral(self.pid_defaults['ki'])
-        self.set_derivative(self.pid_defaults['kd'])
+        with batch(self.client):
+            self.set_setpoint(self.pid_defaults['setpoint'])
+            self.set_proportional(self.pid_defaults['kp'])
+            self.set_integral(self.pid_defaults['ki'])
+            self.set_derivative(self.pid_defaults['kd'])
 
     def set_setpoint(self, value):
         """Set the setpoint of the PID."""
@@ -110,12 +117,10 @@ class PID():
         if value > self.furnace_controller.max_setpoint:
             raise LiveXError("Setpoint exceeds maximum limit.")
         self.setpoint = value
-        write_modbus_float(
-            self.client, value, self.addresses['setpoint']
-        )
-        write_coil(
-            self.client, self.addresses['setpoint_update'], True
-        )
+        FURNACE_REGISTERS.write(self.client, {
+            self.addresses['setpoint']: value,
+            self.addresses['setpoint_update']: True
+        })
         self.furnace_controller.add_event('setpoint_upper', self.setpoint)
 
     def set_proportional(self, value):
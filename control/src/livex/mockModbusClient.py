@@ -3,14 +3,16 @@ Utilities for the LiveX adapters.
 
 Mika Shearwood, STFC Detector Systems Software Group
 """
-from pymodbus.payload import BinaryPayloadDecoder
-from pymodbus.payload import BinaryPayloadBuilder
-from pymodbus.constants import Endian
-
 import logging
+import socket
 import struct
+import time
+
+import numpy as np
 
 from livex.modbusAddresses import modAddr
+from livex.codec import decode_floats, encode_floats, payload_registers
+from livex.packet_decoder import LiveXPacketDecoder
 
 class MockModbusClient:
 
@@ -127,45 +129,46 @@ class MockModbusClient:
 
     def read_coils(self, address, count, slave=1):
         """Simulate reading modbus coils."""
-        values = [self.registers.get(address+i, 0) for i in range(count)]
+        values = [bool(self.registers.get(address+i, 0)) for i in range(count)]
 
-        return MockResponse(bits=[bool(self.registers.get(address,0))])
+        return MockResponse(bits=values)
 
     def write_coil(self, address, value, slave=1):
         """Simulate writing to a coil."""
         self.registers[address] = bool(value)
         return MockResponse()
 
+    def write_coils(self, address, values, slave=1):
+        """Simulate writing to consecutive coils."""
+        for i, value in enumerate(values):
+            self.registers[address+i] = bool(value)
+        return MockResponse()
+
     def write_registers(self, address, payload, slave=1, skip_encode=True):
         """Simulate a register write. Normally floats would be written over two registers, but
         there is no such restriction here. This avoids any bit manipulation for the fake client.
+        Each float in the payload is stored under the address of its first register.
         """
-        payload = b"".join(payload)  # Needs to be one byte string to struct.unpack it
-        registers = list(struct.unpack(f">{len(payload) // 2}H", payload))  # list of bytes
-        decoder = BinaryPayloadDecoder.fromRegisters(
-            registers, wordorder=Endian.LITTLE, byteorder=Endian.BIG
-        )
-        value = decoder.decode_32bit_float()
-
-        self.registers[address] = value
+        values = decode_floats(payload_registers(payload)).tolist()
+        for i, value in enumerate(values):
+            self.registers[address + 2*i] = value
 
         return MockResponse()
 
     def read_input_registers(self, address, count, slave=1):
-        """Simulate a read of two input registers"""
-        orig = self.registers.get(address, 0)
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.LITTLE)
-        builder.add_32bit_float(float(orig))
-
-        return MockResponse(registers=builder.to_registers())
+        """Simulate a read of input registers, with a float every two registers."""
+        return MockResponse(registers=self._read_floats(address, count))
 
     def read_holding_registers(self, address, count, slave=1):
-        """Simulate a read of two holding registers."""
-        orig = self.registers.get(address, 0)
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.LITTLE)
-        builder.add_32bit_float(float(orig))
+        """Simulate a read of holding registers, with a float every two registers."""
+        return MockResponse(registers=self._read_floats(address, count))
 
-        return MockResponse(registers=builder.to_registers())
+    def _read_floats(self, address, count):
+        """Encode the values stored from an address onwards as floats across count registers.
+        Values are stored by their first address, so addresses without one are read as zero.
+        """
+        values = [float(self.registers.get(address + offset, 0)) for offset in range(0, count, 2)]
+        return encode_floats(values)[:count]
 
 class MockResponse:
     """Response object to replicate common pymodbus responses."""
@@ -341,5 +344,151 @@ class MockTCPClient:
         )
         return payload
 
+    def recv_into(self, buffer, nbytes=0):
+        """Generate a packet as in recv, writing it into a provided buffer."""
+        payload = self.recv(len(buffer))
+        buffer[:len(payload)] = payload
+        return len(payload)
+
     def close(self):
-        pass
\ No newline at end of file
+        pass
+
+class MockStreamSource:
+    """Socket-like source of fast data packets at a set rate, for stress testing the stream path.
+
+    Unlike MockTCPClient, which makes one packet per call, packets here become due with the clock
+    at rate per second (up to several kHz) and are made in bulk with NumPy. They are released in
+    bursts of burst packets, so that one read can return several packets at once, and reads can be
+    cut short at a random length up to max_read bytes to split packets across reads. A fraction of
+    frames can be dropped on purpose. If the reader falls more than max_pending bytes behind, as a
+    socket buffer filling up would, the newest packets are lost and counted as overruns; overruns
+    at a given rate mean the reader cannot keep up with it. Call restart when the reader starts
+    reading (e.g. on acquiring), so that packets due while nothing was reading are not returned.
+    """
+
+    def __init__(self, mockPLC, rate=1000, burst=1, max_read=None, drop_rate=0,
+                 max_pending=1 << 20, seed=None):
+        """Initialise the source. Packets start to become due on connect, restart or first read.
+        :param mockPLC: MockPLC providing the values in the packets
+        :param rate: packets per second
+        :param burst: packets released together
+        :param max_read: optional largest number of bytes returned by one read
+        :param drop_rate: fraction of frames left out of the stream
+        :param max_pending: most bytes waiting to be read before packets are lost
+        :param seed: optional seed for short reads and drops
+        """
+        self.plc = mockPLC
+        self.rate = float(rate)
+        self.burst = max(int(burst), 1)
+        self.max_read = max_read
+        self.drop_rate = drop_rate
+        self.max_pending = max_pending
+        self.rng = np.random.default_rng(seed)
+
+        self.dtype = LiveXPacketDecoder(pid_debug=True).dtype
+        self.timeout = None
+        self.started = None
+        self.pending = bytearray()
+
+        self.frames = 0  # Frames due so far, whether sent or not
+        self.sent_bytes = 0
+        self.dropped = 0
+        self.overruns = 0
+
+    def connect(self, address=None):
+        self.restart()
+
+    def restart(self):
+        """Make packets due from now on, discarding any waiting to be read.
+        Frame numbers carry on from the last frame due.
+        """
+        self.started = time.monotonic() - self.frames / self.rate
+        self.pending.clear()
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def send(self, data):
+        return len(data)
+
+    def close(self):
+        self.started = None
+        self.pending.clear()
+
+    def generate(self, count):
+        """Make the packets for the next count frames, leaving out any dropped ones.
+        :param count: number of frames
+        :return: bytes of the packets
+        """
+        frames = np.arange(self.frames, self.frames + count) + 1
+        self.frames += count
+        if self.drop_rate:
+            kept = self.rng.random(count) >= self.drop_rate
+            self.dropped += count - int(kept.sum())
+            frames = frames[kept]
+
+        packets = np.zeros(len(frames), dtype=self.dtype)
+        setpoint = self.plc.client.registers.get(modAddr.pid_setpoint_upper_hold, 30.0)
+        packets['frame'] = frames
+        packets['temperature_upper'] = self.plc.temp
+        packets['temperature_lower'] = self.plc.temp - 2
+        packets['output_upper'] = self.plc.output
+        packets['output_lower'] = self.plc.output * 0.8
+        packets['outputSum_upper'] = packets['outputSum_lower'] = self.plc.outputSum
+        packets['setpoint_upper'] = packets['setpoint_lower'] = setpoint
+        packets['kp_upper'] = packets['kp_lower'] = 0.3
+        packets['ki_upper'] = packets['ki_lower'] = 0.02
+        return packets.tobytes()
+
+    def release(self):
+        """Add the packets due by now to those waiting to be read.
+        :return: time in seconds until the next burst is due
+        """
+        if self.started is None:
+            self.connect()
+        elapsed = time.monotonic() - self.started
+        due = int(elapsed * self.rate) // self.burst * self.burst
+        if due > self.frames:
+            count = due - self.frames
+            room = max(self.max_pending - len(self.pending), 0) // self.dtype.itemsize
+            # Packets that do not fit are lost, as new data is when a socket buffer is full
+            self.pending += self.generate(min(count, room))
+            if count > room:
+                self.overruns += count - room
+                self.frames += count - room
+        return (self.frames + self.burst) / self.rate - elapsed
+
+    def recv_into(self, buffer, nbytes=0):
+        """Wait for packets to be due and copy as many bytes as allowed into a buffer.
+        Raises socket.timeout if none are due within the timeout.
+        """
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        wait = self.release()
+        while not self.pending:
+            if deadline is not None and time.monotonic() + wait > deadline:
+                time.sleep(max(deadline - time.monotonic(), 0))
+                raise socket.timeout("no packets due")
+            time.sleep(max(wait, 0))
+            wait = self.release()
+
+        data = self.read(min(nbytes or len(buffer), len(buffer)))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def read(self, size):
+        """Take up to size bytes of the packets waiting, without waiting for more.
+        The read is cut short at random if max_read is set.
+        """
+        count = min(size, len(self.pending))
+        if self.max_read:
+            count = min(count, int(self.rng.integers(1, self.max_read + 1)))
+        data = bytes(self.pending[:count])
+        del self.pending[:count]
+        self.sent_bytes += count
+        return data
+
+    def recv(self, buffersize):
+        """Receive up to buffersize bytes, as recv_into."""
+        buffer = bytearray(buffersize)
+        count = self.recv_into(buffer)
+        return bytes(buffer[:count])
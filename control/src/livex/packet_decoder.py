@@ -1,6 +1,8 @@
 import struct
 import logging
 
+import numpy as np
+
 class LiveXPacketDecoder(struct.Struct):
 
     def __init__(self, pid_debug=False):
@@ -17,7 +19,7 @@ class LiveXPacketDecoder(struct.Struct):
         self.all_keys = [
             'frame',
             'temperature_upper', 'output_upper', 'kp_upper', 'ki_upper', 'kd_upper', 'lastInput_upper', 'outputSum_upper', 'setpoint_upper',
-            'temperature_lower', 'output_lower', 'kp_lower', 'ki_lower', 'kd_lower', 'lastInput_lower', 'outputSum_lower', 'setpoint_upper'
+            'temperature_lower', 'output_lower', 'kp_lower', 'ki_lower', 'kd_lower', 'lastInput_lower', 'outputSum_lower', 'setpoint_lower'
         ]
 
         # keys for non-debug data
@@ -28,6 +30,16 @@ class LiveXPacketDecoder(struct.Struct):
         self.keys = self.all_keys if pid_debug else self.selected_keys
         self.data = {key: None for key in self.keys}  # Initialise all values to None
 
+        # Structured dtype equivalent to the struct format (native order, no padding), so that a
+        # buffer holding many packets can be viewed as an array of records without a Python loop
+        self.dtype = np.dtype([(key, 'f4') for key in self.all_keys])
+        if self.dtype.itemsize != self.size:
+            raise ValueError(
+                f"Packet dtype size {self.dtype.itemsize} does not match struct size {self.size}"
+            )
+        # Trailing bytes of an incomplete packet, carried over to the next unpack_batch call
+        self.remainder = b''
+
     def unpack(self, reading):
         """Read the latest data from the stream and unpack it into initialised values."""
         unpacked = super().unpack(reading)
@@ -40,3 +52,29 @@ class LiveXPacketDecoder(struct.Struct):
             self.data = {key: unpacked[i] for key, i in zip(self.keys, self.selected_indexes)}
 
         return self.data
+
+    def unpack_batch(self, reading):
+        """Unpack every complete packet in a buffer of arbitrary length.
+
+        Any trailing partial packet is kept and prepended to the reading in the next call.
+        The latest complete packet is also stored in self.data, as with unpack.
+        :param reading: bytes-like object containing zero or more packets
+        :return: dict of column arrays keyed as self.keys, one element per complete packet
+        """
+        if self.remainder:
+            reading = self.remainder + bytes(reading)
+
+        count = len(reading) // self.size
+        self.remainder = bytes(reading[count * self.size:])
+
+        packets = np.frombuffer(reading, dtype=self.dtype, count=count)
+        columns = {key: packets[key] for key in self.keys}
+
+        if count:
+            self.data = {key: columns[key][-1].item() for key in self.keys}
+
+        return columns
+
+    def reset(self):
+        """Discard any partial packet held from a previous reading."""
+        self.remainder = b''
@@ -0,0 +1,177 @@
+"""
+Offline PID tuning by simulating many sets of gains at once.
+
+Each combination of (kp, ki, kd, power_output_scale) drives its own copy of the two-zone thermal
+model from livex.thermal_sim through a setpoint step, with every copy stepped together as one
+NumPy batch. Overshoot, settling time and steady-state error are measured as the simulation runs,
+so no traces are kept and thousands of combinations fit in memory. Large grids can be split
+across a process pool. The model can be fitted to a recorded furnace HDF5 file first, so the
+gains are tried against the furnace as it behaved.
+
+    params, start = params_from_hdf5('testLog.h5')
+    results = sweep_grid(
+        kp=np.linspace(5, 50, 10), ki=np.linspace(0.5, 10, 20), kd=[0, 0.1, 1],
+        scale=[0.8, 1.0], setpoint=600, initial=start, params=params, processes=4
+    )
+    best = np.argsort(results['settling_time'].max(axis=1))[:10]
+"""
+import dataclasses
+import itertools
+from concurrent import futures
+
+import h5py
+import numpy as np
+
+from livex.thermal_sim import PIDArray, ThermalModel, ThermalParameters
+
+def sweep(kp, ki, kd, scale=1.0, setpoint=100.0, initial=None, duration=600.0, dt=0.1,
+          params=None, settle_band=0.02, tail=0.1):
+    """Simulate a setpoint step for each combination of gains.
+    Both heaters are given the same gains and setpoint.
+    :param kp, ki, kd, scale: arrays of equal length (or scalars) giving each combination
+    :param setpoint: setpoint stepped to at the start
+    :param initial: starting temperature (or one per heater), room temperature by default
+    :param duration: simulated time in seconds
+    :param dt: PID period in seconds
+    :param params: optional ThermalParameters
+    :param settle_band: fraction of the step size within which the temperature counts as settled
+    :param tail: fraction of the duration at the end over which steady-state error is averaged
+    :return: dict of the combination arrays and metric arrays of shape (combinations, 2) for the
+        upper and lower heater. overshoot is in degrees past the setpoint, settling_time is the
+        time after which the temperature stays within the band (inf if it never does), and
+        steady_state_error is the mean absolute error over the tail
+    """
+    kp, ki, kd, scale = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(v, dtype=float)) for v in (kp, ki, kd, scale))
+    )
+    count = kp.size
+    params = params or ThermalParameters()
+    initial = params.room if initial is None else initial
+
+    model = ThermalModel(params, batch=count)
+    model.reset(initial)
+    pid = PIDArray(kp[:, None], ki[:, None], kd[:, None], shape=(count, 2))
+    power_scale = scale[:, None]
+
+    steps = int(round(duration / dt))
+    tail_start = steps - max(int(steps * tail), 1)
+    start = float(np.mean(initial))
+    band = settle_band * max(abs(setpoint - start), 1e-9)
+    direction = 1 if setpoint >= start else -1
+
+    peak = model.sensor * direction
+    last_outside = np.zeros((count, 2))
+    tail_error = np.zeros((count, 2))
+    for step in range(steps):
+        output = pid.update(setpoint, model.sensor, dt)
+        model.step(output * power_scale, dt)
+        temperature = model.sensor
+        t = (step + 1) * dt
+
+        peak = np.maximum(peak, temperature * direction)
+        last_outside[np.abs(temperature - setpoint) > band] = t
+        if step >= tail_start:
+            tail_error += np.abs(temperature - setpoint)
+
+    # Still outside the band at the end means it never settled
+    settling_time = np.where(last_outside >= steps * dt, np.inf, last_outside)
+    return {
+        'kp': kp, 'ki': ki, 'kd': kd, 'scale': scale,
+        'overshoot': np.maximum(peak - setpoint * direction, 0),
+        'settling_time': settling_time,
+        'steady_state_error': tail_error / (steps - tail_start)
+    }
+
+def sweep_grid(kp, ki, kd, scale=(1.0,), processes=None, chunk_size=1000, **kwargs):
+    """Simulate every combination of the given values of each gain.
+    :param kp, ki, kd, scale: sequences of values to combine
+    :param processes: number of worker processes, or None to run in this process
+    :param chunk_size: combinations simulated together in one batch
+    :param kwargs: other arguments for sweep
+    :return: dict of arrays as from sweep, one row per combination
+    """
+    grid = np.array(list(itertools.product(kp, ki, kd, scale)), dtype=float).reshape(-1, 4)
+    chunks = [grid[i:i + chunk_size] for i in range(0, len(grid), chunk_size)]
+
+    if processes:
+        with futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            jobs = [executor.submit(sweep, *chunk.T, **kwargs) for chunk in chunks]
+            results = [job.result() for job in jobs]
+    else:
+        results = [sweep(*chunk.T, **kwargs) for chunk in chunks]
+
+    return {key: np.concatenate([result[key] for result in results]) for key in results[0]}
+
+def params_from_hdf5(path, scale=1.0, data_groupname='fast_data', base=None, pid_frequency=None):
+    """Fit the heating and loss rates of the thermal model to a recorded acquisition.
+
+    The temperature rate of change of each heater is fitted by least squares to
+    heat_gain * (scale * output)^2 - loss * (temperature - room), using the outputs in slow_data
+    and the temperatures in the stream data. Time is taken from the frame counter, the PLC's own
+    clock, rather than the host receive times, which only show when packets arrived. Those are
+    used only to find the frame rate, if it is not given. Rows repeating a frame are left out, and
+    frames going backwards (e.g. a file holding more than one acquisition) are rejected. Room
+    temperature is taken as known. Sensor lag and the coupling between the heaters are left out of
+    the fit, so heat_gain comes out biased low.
+    :param path: path of the furnace HDF5 file
+    :param scale: power output scale the file was recorded with
+    :param data_groupname: group of the stream data
+    :param base: optional ThermalParameters to take the other constants (and room) from
+    :param pid_frequency: frames per second of the stream, as the pid_frequency option. Found from
+    the host receive times in the file if not given
+    :return: tuple of the fitted ThermalParameters and the first recorded heater temperatures
+    :raises ValueError: if the frames go backwards, or the frame rate cannot be found
+    """
+    with h5py.File(path, 'r') as file:
+        fast = file[data_groupname]
+        slow = file['slow_data']
+        frames = fast['frame'][()]
+        slow_frames = slow['frame'][()]
+        temperatures = [fast['temperature_upper'][()], fast['temperature_lower'][()]]
+        outputs = [slow['output_upper'][()], slow['output_lower'][()]]
+        received = fast['host_monotonic'][()] if 'host_monotonic' in fast else None
+
+    keep = _new_frames(frames, data_groupname)
+    frames = frames[keep]
+    temperatures = [temperature[keep] for temperature in temperatures]
+    slow_keep = _new_frames(slow_frames, 'slow_data')
+    slow_frames = slow_frames[slow_keep]
+    outputs = [output[slow_keep] for output in outputs]
+
+    if pid_frequency is None:
+        if received is None or len(frames) < 2:
+            raise ValueError(f"No receive times in {path} to find the frame rate from, "
+                             "so pid_frequency must be given")
+        # The PLC runs at a whole number of frames per second; the fit smooths out receive jitter
+        slope = np.polyfit(received[keep], frames, 1)[0]
+        pid_frequency = max(round(slope), 1)
+
+    base = base or ThermalParameters()
+    t = slow_frames / pid_frequency
+    rows, rates = [], []
+    for temperature, output in zip(temperatures, outputs):
+        temperature = np.interp(slow_frames, frames, temperature)
+        rates.append(np.gradient(temperature, t))
+        rows.append(np.column_stack(
+            (np.square(scale * output), base.room - temperature)
+        ))
+    (gain, loss), *_ = np.linalg.lstsq(np.vstack(rows), np.concatenate(rates), rcond=None)
+
+    fitted = dataclasses.replace(base, heat_gain=float(gain), loss=float(loss))
+    return fitted, np.array([temperatures[0][0], temperatures[1][0]])
+
+def _new_frames(frames, groupname):
+    """Get a mask of the rows of a frame counter that are not repeats of the frame before.
+    :param frames: frame counter of each row, in the order recorded
+    :param groupname: name of the group the frames are from, for the error
+    :raises ValueError: if the frames go backwards
+    """
+    steps = np.diff(frames)
+    backwards = np.flatnonzero(steps < 0)
+    if backwards.size:
+        row = backwards[0] + 1
+        raise ValueError(
+            f"Frames in {groupname} go back from {frames[row - 1]:.0f} to {frames[row]:.0f} at row "
+            f"{row}; fit each acquisition from its own file"
+        )
+    return np.concatenate(([True], steps > 0))
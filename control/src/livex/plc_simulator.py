@@ -0,0 +1,318 @@
+"""
+Local simulator of the LiveX PLCs, for testing the adapters over a real network connection.
+
+The mock clients skip the network, framing and timing entirely. This serves the same registers
+(MockModbusClient.furnace_registers and trigger_registers) over Modbus TCP instead, runs the MockPLC
+physics in the background and streams fast data packets as the furnace PLC does, so that the real
+ModbusTcpClient and socket code paths can be run and timed against it. Each request can be given a
+latency, with jitter, and faults can be injected at random: exception responses, requests that are
+never answered, and dropped connections.
+
+Run it with, for example:
+
+    python -m livex.plc_simulator --modbus-port 5020 --trigger-port 5021 --stream-port 4444 \
+        --latency 0.005 --jitter 0.002 --error-rate 0.01
+
+and point the adapters at it with ip = 127.0.0.1 and modbus_port (and port for the stream) set to
+match.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import socket
+import struct
+
+from livex.modbusAddresses import modAddr
+from livex.mockModbusClient import MockModbusClient, MockPLC, MockStreamSource
+
+_MBAP = struct.Struct('>HHHB')  # Transaction id, protocol id, length, unit id
+_WORD = struct.Struct('>H')
+
+# Modbus exception codes
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_VALUE = 0x03
+SERVER_DEVICE_FAILURE = 0x04
+
+class ModbusSimulator():
+    """Class serving the registers of a MockModbusClient over Modbus TCP.
+
+    Function codes 1 (read coils), 3 (read holding registers), 4 (read input registers), 5 (write
+    coil), 6 (write register), 15 (write coils) and 16 (write registers) are supported. Requests
+    pipelined on one connection are handled concurrently, each answered after its own latency.
+    The mock stores each float under the address of its first register, so a write that covers
+    only one register of a float is merged with the float's other register as already stored.
+    """
+
+    def __init__(self, client, latency=0, jitter=0, error_rate=0, drop_rate=0, disconnect_rate=0,
+                 seed=None):
+        """Initialise the simulator.
+        :param client: MockModbusClient holding the registers to serve
+        :param latency: time in seconds before each request is answered
+        :param jitter: largest random change to the latency, in seconds
+        :param error_rate: fraction of requests answered with a device failure exception
+        :param drop_rate: fraction of requests never answered
+        :param disconnect_rate: fraction of requests on which the connection is closed
+        :param seed: optional seed for the random latency and faults
+        """
+        self.client = client
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.disconnect_rate = disconnect_rate
+        self.random = random.Random(seed)
+        self.server = None
+
+        self.requests = 0
+        self.errors = 0
+        self.dropped = 0
+        self.disconnects = 0
+        self.connections = 0
+
+    async def start(self, host='127.0.0.1', port=502):
+        """Start listening for connections."""
+        self.server = await asyncio.start_server(self._serve, host, port)
+        logging.info(f"Modbus simulator listening on {host}:{port}")
+        return self.server
+
+    async def _serve(self, reader, writer):
+        """Handle the requests on one connection until it closes."""
+        self.connections += 1
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                header = await reader.readexactly(_MBAP.size)
+                transaction, protocol, length, unit = _MBAP.unpack(header)
+                pdu = await reader.readexactly(length - 1)
+
+                fault = self.random.random()
+                if fault < self.disconnect_rate:
+                    self.disconnects += 1
+                    break
+                task = asyncio.ensure_future(
+                    self._respond(writer, write_lock, transaction, protocol, unit, pdu, fault)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _respond(self, writer, write_lock, transaction, protocol, unit, pdu, fault):
+        """Answer a request after the simulated latency."""
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        self.requests += 1
+        fault -= self.disconnect_rate
+        if fault < self.drop_rate:
+            self.dropped += 1
+            return
+        if fault - self.drop_rate < self.error_rate:
+            self.errors += 1
+            response = bytes([pdu[0] | 0x80, SERVER_DEVICE_FAILURE])
+        else:
+            response = self.handle(pdu)
+
+        async with write_lock:
+            writer.write(_MBAP.pack(transaction, protocol, len(response) + 1, unit) + response)
+            await writer.drain()
+
+    def handle(self, pdu):
+        """Carry out a request.
+        :param pdu: bytes of the request, from the function code on
+        :return: bytes of the response, from the function code on
+        """
+        function = pdu[0]
+        try:
+            if function == 1:
+                address, count = struct.unpack('>HH', pdu[1:5])
+                bits = self.client.read_coils(address, count).bits
+                data = bytearray((count + 7) // 8)
+                for i, bit in enumerate(bits):
+                    if bit:
+                        data[i // 8] |= 1 << (i % 8)
+                return bytes([function, len(data)]) + bytes(data)
+
+            if function in (3, 4):
+                address, count = struct.unpack('>HH', pdu[1:5])
+                registers = self._read_words(address, count)
+                return bytes([function, 2 * count]) + struct.pack(f'>{count}H', *registers)
+
+            if function == 5:
+                address, value = struct.unpack('>HH', pdu[1:5])
+                self.client.write_coil(address, value == 0xFF00)
+                return pdu[:5]
+
+            if function == 6:
+                address, value = struct.unpack('>HH', pdu[1:5])
+                self._write_words(address, [value])
+                return pdu[:5]
+
+            if function == 15:
+                address, count = struct.unpack('>HH', pdu[1:5])
+                data = pdu[6:]
+                self.client.write_coils(
+                    address, [bool(data[i // 8] >> (i % 8) & 1) for i in range(count)]
+                )
+                return pdu[:5]
+
+            if function == 16:
+                address, count = struct.unpack('>HH', pdu[1:5])
+                self._write_words(address, list(struct.unpack(f'>{count}H', pdu[6:6 + 2 * count])))
+                return pdu[:5]
+        except (struct.error, IndexError):
+            return bytes([function | 0x80, ILLEGAL_DATA_VALUE])
+
+        return bytes([function | 0x80, ILLEGAL_FUNCTION])
+
+    def _read_words(self, address, count):
+        """Read count 16-bit registers from an address."""
+        return self.client.read_holding_registers(address, count).registers
+
+    def _write_words(self, address, words):
+        """Write 16-bit registers from an address, each into the float that holds it."""
+        registers = self.client.registers
+        i = 0
+        while i < len(words):
+            register = address + i
+            # A register is the second of a float if the one before it starts a stored float
+            base = register if register in registers or register - 1 not in registers else register - 1
+            if base == register and i + 1 < len(words):
+                pair = words[i:i + 2]  # Covers the whole float
+                step = 2
+            else:
+                pair = self._read_words(base, 2)
+                pair[register - base] = words[i]
+                step = 1
+            self.client.write_registers(base, [_WORD.pack(word) for word in pair])
+            i += step
+
+class StreamSimulator():
+    """Class sending fast data packets to each connected client, as the furnace PLC does.
+
+    Packets come from a MockStreamSource for each client, made from the MockPLC state, so the same
+    rate, burst, short read (here short write) and frame drop patterns can be used over a socket as
+    in-process. Once the client has sent its activation message, packets are sent while the
+    acquisition coil is set, with frames counted from 1 again each time it is set.
+    """
+
+    def __init__(self, plc, rate=50, **pattern):
+        """Initialise the stream.
+        :param plc: MockPLC providing the values
+        :param rate: packets per second
+        :param pattern: other MockStreamSource options (burst, max_read, drop_rate, seed)
+        """
+        self.plc = plc
+        self.rate = rate
+        self.pattern = pattern
+        self.server = None
+        self.sources = []
+        self.poll_interval = 0.01  # Time in seconds between checks of the coil while it is clear
+
+    async def start(self, host='127.0.0.1', port=4444):
+        """Start listening for connections."""
+        self.server = await asyncio.start_server(self._serve, host, port)
+        logging.info(f"Stream simulator listening on {host}:{port}")
+        return self.server
+
+    async def _serve(self, reader, writer):
+        """Stream packets to one client until it disconnects."""
+        # Short writes go out as they are rather than being merged
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        source = MockStreamSource(self.plc, rate=self.rate, **self.pattern)
+        self.sources.append(source)
+        try:
+            await reader.read(1)  # Activation message
+            registers = self.plc.client.registers
+            acquiring = False
+            while True:
+                if not registers.get(modAddr.acquisition_coil, False):
+                    acquiring = False
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                if not acquiring:
+                    # The PLC starts counting frames again for each acquisition
+                    acquiring = True
+                    source.frames = 0
+                    source.restart()
+                wait = source.release()
+                while source.pending:
+                    writer.write(source.read(len(source.pending)))
+                    await writer.drain()
+                await asyncio.sleep(max(wait, 0))
+        except ConnectionError:
+            pass
+        finally:
+            self.sources.remove(source)
+            writer.close()
+            logging.info(
+                f"Stream client gone after {source.frames} frames: {source.dropped} dropped, "
+                f"{source.overruns} overrun"
+            )
+
+async def run_physics(plc, interval=0.2):
+    """Step the MockPLC simulation at a fixed interval, as the adapter does when mocking."""
+    registers = plc.client.registers
+    while True:
+        plc.bg_temp_task()
+        registers[modAddr.counter_inp] = registers.get(modAddr.counter_inp, 0) + 1
+        await asyncio.sleep(interval)
+
+async def serve(args):
+    """Start the servers given by the command line arguments and run until cancelled."""
+    faults = dict(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        drop_rate=args.drop_rate, disconnect_rate=args.disconnect_rate, seed=args.seed
+    )
+    furnace_client = MockModbusClient(registers=dict(MockModbusClient.furnace_registers))
+    plc = MockPLC(furnace_client)
+
+    servers = [await ModbusSimulator(furnace_client, **faults).start(args.host, args.modbus_port)]
+    if args.trigger_port:
+        trigger_client = MockModbusClient(registers=dict(MockModbusClient.trigger_registers))
+        servers.append(await ModbusSimulator(trigger_client, **faults).start(args.host, args.trigger_port))
+    if args.stream_port:
+        stream = StreamSimulator(
+            plc, args.stream_rate, burst=args.stream_burst, max_read=args.stream_max_write,
+            drop_rate=args.stream_drop_rate, seed=args.seed
+        )
+        servers.append(await stream.start(args.host, args.stream_port))
+
+    await run_physics(plc, args.physics_interval)
+
+def main():
+    """Run the simulator from the command line."""
+    parser = argparse.ArgumentParser(description="Simulate the LiveX PLCs over Modbus TCP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--modbus-port', type=int, default=5020, help="furnace Modbus port")
+    parser.add_argument('--trigger-port', type=int, default=0, help="trigger Modbus port, 0 for none")
+    parser.add_argument('--stream-port', type=int, default=4444, help="fast data port, 0 for none")
+    parser.add_argument('--stream-rate', type=float, default=50, help="packets per second")
+    parser.add_argument('--stream-burst', type=int, default=1, help="packets sent together")
+    parser.add_argument('--stream-max-write', type=int, default=None, help="largest write in bytes")
+    parser.add_argument('--stream-drop-rate', type=float, default=0, help="fraction of frames dropped")
+    parser.add_argument('--physics-interval', type=float, default=0.2)
+    parser.add_argument('--latency', type=float, default=0, help="seconds per request")
+    parser.add_argument('--jitter', type=float, default=0, help="largest change to the latency")
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--drop-rate', type=float, default=0)
+    parser.add_argument('--disconnect-rate', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--debug', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import time
+
+class PollGroup():
+    """A set of values polled together, at a rate that adapts to what the system is doing.
+
+    The group is read at its fastest (the scheduler's base interval, or min_interval if set) while
+    its fast_when rule holds, e.g. while a PID is enabled. Otherwise, once its values have not
+    changed for static_cycles reads in a row, the interval doubles after each unchanged read up to
+    max_interval, and drops back to the fastest as soon as anything changes. While its pause_when
+    rule holds, e.g. while the values come from somewhere else, the group is not read at all.
+    """
+
+    def __init__(self, name, reader, max_interval=5.0, min_interval=None, fast_when=None,
+                 static_cycles=5, tolerance=0, ignore=(), pause_when=None):
+        """Initialise the group.
+        :param name: name of the group, shown in the parameter tree
+        :param reader: BlockReader for the group's values
+        :param max_interval: longest time between reads in seconds
+        :param min_interval: shortest time between reads, the scheduler base interval by default
+        :param fast_when: optional callable returning True while the group should be read fastest
+        :param static_cycles: unchanged reads before the interval starts to grow
+        :param tolerance: largest difference between reads still counted as unchanged
+        :param ignore: names of values that always change (e.g. counters), not checked for changes
+        :param pause_when: optional callable returning True while the group should not be read
+        """
+        self.name = name
+        self.reader = reader
+        self.max_interval = max_interval
+        self.min_interval = min_interval
+        self.fast_when = fast_when
+        self.static_cycles = static_cycles
+        self.tolerance = tolerance
+        self.ignore = set(ignore)
+        self.pause_when = pause_when
+
+        self.interval = None  # Current interval, set on first read
+        self.next_due = 0
+        self.unchanged = 0  # Reads in a row with no change
+        self.last_values = None
+
+    def fastest(self, base_interval):
+        """Get the shortest interval for this group."""
+        return self.min_interval if self.min_interval is not None else base_interval
+
+    def update(self, values, now, base_interval):
+        """Work out the next interval after a read.
+        :param values: dict of values just read
+        :param now: time of the read, from the scheduler clock
+        :param base_interval: scheduler base interval
+        """
+        fastest = self.fastest(base_interval)
+        watched = {name: value for name, value in values.items() if name not in self.ignore}
+        self.unchanged = self.unchanged + 1 if self._same(watched, self.last_values) else 0
+        self.last_values = watched
+
+        if (self.fast_when and self.fast_when()) or self.unchanged < self.static_cycles:
+            self.interval = fastest
+        else:
+            self.interval = min(max(self.interval or fastest, fastest) * 2, self.max_interval)
+        self.next_due = now + self.interval
+
+    def _same(self, values, previous):
+        """Whether values are all within tolerance of the previous read."""
+        if previous is None or values.keys() != previous.keys():
+            return False
+        return all(abs(values[name] - previous[name]) <= self.tolerance for name in values)
+
+class PollScheduler():
+    """Class to decide which PollGroups are due to be read on each cycle of a polling task."""
+
+    def __init__(self, groups, base_interval, clock=time.monotonic):
+        """Initialise the scheduler.
+        :param groups: list of PollGroup
+        :param base_interval: fastest interval of groups without their own min_interval
+        :param clock: function giving the time in seconds, e.g. a simulation's virtual clock
+        """
+        self.groups = {group.name: group for group in groups}
+        self.base_interval = base_interval
+        self.clock = clock
+
+        self.round_trips = 0  # Requests made by the last poll
+        self.duration = 0  # Time taken by the last poll, in seconds
+
+    def poll(self, client):
+        """Read every group that is due, or whose fast rule has just come on.
+        :param client: Modbus client to read with
+        :return: dict of group name to dict of values, for the groups read
+        """
+        now = self.clock()
+        started = time.perf_counter()
+        results = {}
+        round_trips = 0
+        for group in self.groups.values():
+            if group.pause_when and group.pause_when():
+                group.next_due = 0  # Read as soon as the pause ends
+                continue
+            # A group slowed down is read straight away if its fast rule comes on
+            speed_up = (
+                group.fast_when and group.fast_when()
+                and group.interval != group.fastest(self.base_interval)
+            )
+            if now < group.next_due and not speed_up:
+                continue
+            values = group.reader.read(client)
+            round_trips += group.reader.round_trips
+            group.update(values, now, self.base_interval)
+            results[group.name] = values
+
+        if results:
+            self.round_trips = round_trips
+            self.duration = time.perf_counter() - started
+        return results
+
+    def rates_tree(self):
+        """Get a dict of the current interval and rate of each group, for a parameter tree."""
+        return {
+            name: {
+                'interval': (lambda g=group: g.interval, None),
+                'paused': (lambda g=group: bool(g.pause_when and g.pause_when()), None),
+                'rate': (lambda g=group: 1 / g.interval if g.interval else None, None)
+            }
+            for name, group in self.groups.items()
+        }
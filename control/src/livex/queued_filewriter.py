@@ -0,0 +1,171 @@
+import logging
+import queue
+import threading
+import time
+from concurrent import futures
+from functools import partial
+
+class QueuedFileWriter():
+    """Class to write data to an HDF5 file from a dedicated thread.
+
+    Batches are put on a bounded queue by whichever thread produces them, and are taken off and
+    written by a writer thread. That thread is the only one to use the h5py.File, from opening it
+    to closing it, so a slow disk holds up the queue rather than the producer. If the queue is full,
+    a batch is dropped and counted instead. If the file cannot be opened, the error is raised to
+    the caller of open_file and the thread stops rather than failing every batch after it. Once
+    close_file has been called, or the thread has stopped, batches are dropped rather than queued,
+    so that nothing is left waiting to be written into the next file opened.
+    """
+
+    def __init__(self, file_writer, max_queue=8):
+        """Initialise the queued writer. The thread is started when the file is opened.
+        :param file_writer: FileWriter used to write the batches
+        :param max_queue: maximum number of batches waiting to be written
+        """
+        self.file_writer = file_writer
+        self.max_queue = max_queue
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = None
+        self.accepting = False  # Whether batches are taken, from open_file until close_file
+
+        self.written_batches = 0
+        self.failed_batches = 0  # Batches taken off the queue but not written because of an error
+        self.dropped_batches = 0
+        self.write_latency = 0  # Time from a batch being queued to it being written, in seconds
+        self.max_write_latency = 0
+
+    @property
+    def queue_depth(self):
+        """Number of batches waiting to be written."""
+        return self.queue.qsize()
+
+    def open_file(self, layout=None, timeout=None):
+        """Start the writer thread and have it open the file, waiting until it has.
+        :param layout: optional dict of group name to list of datasets to create on opening
+        :param timeout: optional time in seconds to wait for the file to be opened
+        :raises: the error from opening the file, in which case the writer thread stops
+        """
+        if not (self.thread and self.thread.is_alive()):
+            self._discard_queued()  # Left by a thread that stopped, and meant for an earlier file
+            self.thread = threading.Thread(target=self._run, name="QueuedFileWriter", daemon=True)
+            self.thread.start()
+
+        self.written_batches = 0
+        self.failed_batches = 0
+        self.dropped_batches = 0
+        self.max_write_latency = 0
+        self.accepting = True
+        opened = futures.Future()
+        self.queue.put((partial(self.file_writer.open_file, layout=layout), (), None, None, opened))
+        opened.result(timeout)
+
+    def read_dataset(self, groupname, key, timeout=None):
+        """Read back a dataset of the open file on the writer thread, after the writes queued.
+        :param groupname: name of group holding the dataset
+        :param key: name of the dataset
+        :param timeout: optional time in seconds to wait for the data
+        :return: array of the rows written to the dataset, empty if it does not exist
+        """
+        if not (self.thread and self.thread.is_alive()):
+            raise RuntimeError("File writer is not running")
+        done = futures.Future()
+        self.queue.put((self.file_writer.read_dataset, (groupname, key), None, None, done))
+        return done.result(timeout)
+
+    def write_hdf5(self, data, groupname, on_written=None, block=False):
+        """Queue a batch of data to be written to a group of the file.
+        :param data: dict of data, with each dataset as key and its data as value
+        :param groupname: name of group for file
+        :param on_written: optional callable run once the batch is written or dropped
+        :param block: wait for space in the queue instead of dropping the batch if it is full
+        :return: True if the batch was queued, False if it was dropped
+        """
+        if not (self.accepting and self.thread and self.thread.is_alive()):
+            # Nothing would take the batch off the queue, and waiting for room would never end
+            self.record_dropped(on_written)
+            logging.warning(f"File writer not running, dropped batch for group {groupname}")
+            return False
+
+        item = (self.file_writer.write_hdf5, (data, groupname), on_written, time.monotonic(), None)
+        try:
+            self.queue.put(item, block=block)
+        except queue.Full:
+            self.record_dropped(on_written)
+            logging.warning(f"File writer queue full, dropped batch for group {groupname}")
+            return False
+        return True
+
+    def record_dropped(self, on_written=None):
+        """Count a batch that was dropped rather than written, and release its data."""
+        self.dropped_batches += 1
+        if on_written:
+            on_written()
+
+    def close_file(self, timeout=None):
+        """Write out everything already queued, then close the file and stop the thread.
+        :param timeout: optional time in seconds to wait for the thread to finish
+        """
+        self.accepting = False
+        if not (self.thread and self.thread.is_alive()):
+            self._discard_queued()
+            self.file_writer.close_file()
+            return
+
+        self.queue.put((self.file_writer.close_file, (), None, None, None))
+        self.queue.put(None)  # Stop the thread once the queue is drained
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            logging.warning("File writer thread did not finish writing in time")
+
+    def _discard_queued(self):
+        """Drop everything left on the queue, counting the batches and freeing their data."""
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is None:
+                continue
+            _, _, on_written, queued_time, done = item
+            if queued_time is not None:
+                self.record_dropped(on_written)
+            elif on_written:
+                on_written()
+            if done is not None:
+                done.set_exception(RuntimeError("File writer stopped before this was done"))
+
+    def _run(self):
+        """Writer thread loop, taking batches off the queue in order until told to stop."""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            func, args, on_written, queued_time, done = item
+            result = error = None
+            try:
+                result = func(*args)
+            except Exception as e:
+                error = e
+                logging.error(f"Error in file writer thread: {e}")
+            finally:
+                if on_written:
+                    on_written()
+
+            if queued_time is not None:
+                if error is None:
+                    self.written_batches += 1
+                else:
+                    self.failed_batches += 1
+                self.write_latency = time.monotonic() - queued_time
+                self.max_write_latency = max(self.max_write_latency, self.write_latency)
+
+            if done is not None:
+                if error is None:
+                    done.set_result(result)
+                else:
+                    done.set_exception(error)
+                    if not self.file_writer.file:
+                        break  # No file to write to, so stop rather than fail every batch
+
+        logging.debug("File writer thread stopping")
@@ -0,0 +1,47 @@
+import time
+
+import numpy as np
+
+class ReceiveClock():
+    """Class to timestamp packets from the stream with the host time they were received.
+
+    The host only sees when a read returns, so every packet in a batch gets the same receive time.
+    Packet times are instead spread back from the end of the batch: the last packet is stamped with
+    the receive time and each earlier one a step before it. The step is the time since the previous
+    batch shared between its packets, but never more than the nominal packet period, so that a
+    stall in the stream does not stretch the batch that ends it.
+    Both a monotonic time (for latency and jitter) and a wall-clock time (for aligning with other
+    instruments) are given, as float64 seconds.
+    """
+
+    def __init__(self, period):
+        """Initialise the clock.
+        :param period: nominal time between packets in seconds
+        """
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        """Forget the previous batch, e.g. at the start of an acquisition."""
+        self.last_monotonic = None
+
+    def stamp(self, count):
+        """Get timestamps for a batch of packets received just now.
+        :param count: number of packets in the batch
+        :return: dict of 'host_monotonic' and 'host_time' arrays, one value per packet
+        """
+        monotonic = time.monotonic()
+        wall = time.time()
+
+        step = self.period
+        if count:
+            if self.last_monotonic is not None:
+                step = min((monotonic - self.last_monotonic) / count, self.period)
+            self.last_monotonic = monotonic
+
+        # Time of each packet before the last one in the batch, i.e. (count-1-i) * step
+        offsets = np.arange(count - 1, -1, -1, dtype=np.float64) * step
+        return {
+            'host_monotonic': monotonic - offsets,
+            'host_time': wall - offsets
+        }
@@ -0,0 +1,144 @@
+import struct
+import threading
+import time
+
+_WORD = struct.Struct('>H')
+
+class RegisterCache():
+    """Cache of the last known contents of a Modbus device's coils and registers.
+
+    Entries are raw coil bits and 16-bit register words, keyed by kind ('coil', 'input' or
+    'holding') and address, each with the time it was last read or written. An entry older than
+    the time-to-live is treated as missing, so values the device changes by itself are read again
+    once they go stale.
+    """
+
+    def __init__(self, ttl=1.0):
+        """Initialise an empty cache.
+        :param ttl: time in seconds for which an entry can be used. 0 disables the cache
+        """
+        self.ttl = ttl
+        self.entries = {}  # (kind, address) to (value, timestamp)
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, kind, address, values, timestamp=None):
+        """Store values read from or written to consecutive addresses.
+        :param kind: 'coil', 'input' or 'holding'
+        :param address: address of the first value
+        :param values: list of coil bits or register words
+        :param timestamp: time the values were current, now by default
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self.lock:
+            for i, value in enumerate(values):
+                self.entries[(kind, address + i)] = (value, timestamp)
+
+    def get(self, kind, address, count=1, max_age=None):
+        """Get cached values from consecutive addresses, if all of them are fresh.
+        :param kind: 'coil', 'input' or 'holding'
+        :param address: address of the first value
+        :param count: number of values
+        :param max_age: oldest entry in seconds that can be used, the cache TTL by default
+        :return: list of values, or None if any is missing or stale
+        """
+        max_age = self.ttl if max_age is None else max_age
+        oldest = time.monotonic() - max_age
+        with self.lock:
+            entries = [self.entries.get((kind, address + i)) for i in range(count)]
+            if max_age > 0 and all(entry and entry[1] >= oldest for entry in entries):
+                self.hits += 1
+                return [entry[0] for entry in entries]
+            self.misses += 1
+            return None
+
+    def discard(self, kind, address, count=1):
+        """Forget the entries of consecutive addresses, e.g. while a write to them is in doubt."""
+        with self.lock:
+            for i in range(count):
+                self.entries.pop((kind, address + i), None)
+
+    def invalidate(self):
+        """Forget every entry, e.g. after reconnecting."""
+        with self.lock:
+            self.entries.clear()
+
+class CachingClient():
+    """Wrapper for a Modbus client that keeps a RegisterCache up to date.
+
+    Every read response updates the cache, and so does every write the device accepts. A write
+    first drops the entries it covers, and only stores the written values once the device has
+    answered without an error, so a failed write is never reported as done. Writes held by a
+    BatchingClient batch get no response yet, and leave the entries dropped until they are next
+    read. Reads themselves always go to the device; the util read helpers check client.cache first
+    and only read on a miss.
+    """
+
+    def __init__(self, client, ttl=1.0):
+        """Wrap a client.
+        :param client: ModbusTcpClient, BatchingClient or mock
+        :param ttl: time in seconds for which cached values can be used
+        """
+        self.client = client
+        self.cache = RegisterCache(ttl)
+
+    def __getattr__(self, name):
+        """Pass anything not handled here (e.g. connect, close, batch) to the wrapped client."""
+        return getattr(self.client, name)
+
+    def read_coils(self, address, count=1, slave=1):
+        response = self.client.read_coils(address, count=count, slave=slave)
+        if not _is_error(response):
+            self.cache.update('coil', address, [bool(bit) for bit in response.bits[:count]])
+        return response
+
+    def read_input_registers(self, address, count=1, slave=1):
+        response = self.client.read_input_registers(address, count=count, slave=slave)
+        if not _is_error(response):
+            self.cache.update('input', address, list(response.registers))
+        return response
+
+    def read_holding_registers(self, address, count=1, slave=1):
+        response = self.client.read_holding_registers(address, count=count, slave=slave)
+        if not _is_error(response):
+            self.cache.update('holding', address, list(response.registers))
+        return response
+
+    def write_coil(self, address, value, slave=1):
+        return self._write('coil', address, [bool(value)],
+                           self.client.write_coil, address, value, slave=slave)
+
+    def write_coils(self, address, values, slave=1):
+        return self._write('coil', address, [bool(value) for value in values],
+                           self.client.write_coils, address, values, slave=slave)
+
+    def write_registers(self, address, values, slave=1, skip_encode=False):
+        words = [_WORD.unpack(value)[0] for value in values] if skip_encode else list(values)
+        return self._write('holding', address, words,
+                           self.client.write_registers, address, values, slave=slave,
+                           skip_encode=skip_encode)
+
+    def write_register(self, address, value, slave=1):
+        return self._write('holding', address, [value],
+                           self.client.write_register, address, value, slave=slave)
+
+    def _write(self, kind, address, values, write, *args, **kwargs):
+        """Make a write, caching the values written only if the device accepted them.
+        :param kind: 'coil' or 'holding'
+        :param address: first address written
+        :param values: coil bits or register words written
+        :param write: method of the wrapped client to write with, called with args and kwargs
+        :return: the response from the wrapped client
+        """
+        self.cache.discard(kind, address, len(values))
+        response = write(*args, **kwargs)
+        if response is not None and not _is_error(response):
+            self.cache.update(kind, address, values)
+        return response
+
+def _is_error(response):
+    """Whether a response is a Modbus error (mock responses never are)."""
+    return hasattr(response, 'isError') and response.isError()
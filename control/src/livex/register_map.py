@@ -0,0 +1,215 @@
+"""
+Declarative description of the Modbus registers of the LiveX PLCs.
+
+Every address in modAddr is described by a Register, with its type and owning component worked out
+from its name (see the format in modAddr). A RegisterMap groups the registers of one device and
+turns lists of them into coalesced block reads and write batches, so that components share one
+efficient way of talking to the PLC rather than each making their own two-register requests:
+
+    values = FURNACE_REGISTERS.read(client, {'setpoint': modAddr.pid_setpoint_upper_hold})
+    FURNACE_REGISTERS.write(client, {'pid_setpoint_upper_hold': 500, 'setpoint_update_coil': True})
+"""
+from dataclasses import dataclass
+
+from livex.block_read import BlockReader
+from livex.codec import float_payload
+from livex.write_batch import MAX_WRITE_REGISTERS, MAX_WRITE_COILS
+from livex.modbusAddresses import modAddr
+
+# Register kind, width, access and value type by modAddr name suffix
+SUFFIXES = {
+    '_coil': ('coil', 1, 'rw', 'bool'),
+    '_inp': ('input', 2, 'r', 'float'),
+    '_hold': ('holding', 2, 'rw', 'float')
+}
+
+@dataclass(frozen=True)
+class Register():
+    """Description of one value held by the PLC."""
+    name: str
+    kind: str  # 'coil', 'input' or 'holding'
+    address: int
+    width: int  # Number of coils or registers used by the value
+    access: str  # 'r' (read-only) or 'rw'
+    component: str  # Part of the system the value belongs to
+    dtype: str  # 'bool' or 'float'
+
+class RegisterMap():
+    """Class describing the registers of one Modbus device, and how to read and write them."""
+
+    def __init__(self, registers):
+        """Initialise the map.
+        :param registers: iterable of Register
+        """
+        self.registers = {register.name: register for register in registers}
+        self.by_address = {
+            (register.kind, register.address): register for register in self.registers.values()
+        }
+        # Every address used by a register, by kind, which block reads can safely read through
+        self.mapped = {'coil': set(), 'input': set(), 'holding': set()}
+        for register in self.registers.values():
+            addresses = range(register.address, register.address + register.width)
+            self.mapped[register.kind].update(addresses)
+        self._readers = {}  # Block read plans, made on first use
+
+    @classmethod
+    def from_addresses(cls, names, components=None, default_component='furnace', extra=None):
+        """Build a map from modAddr attributes, typed by the suffix of their name.
+        :param names: names of modAddr attributes to include
+        :param components: dict of component name to dict of addresses, e.g. 'gradient' to
+        modAddr.gradient_addresses. Addresses used by more than one are given the default component
+        :param default_component: component of registers not in any of the components
+        :param extra: dict of name to (kind, width, access, dtype) for names without a suffix
+        """
+        owners = {}
+        for component, addresses in (components or {}).items():
+            for address in set(addresses.values()):
+                owners.setdefault(address, set()).add(component)
+
+        registers = []
+        for name in names:
+            description = (extra or {}).get(name)
+            if description is None:
+                suffix = '_' + name.rsplit('_', 1)[-1]
+                description = SUFFIXES.get(suffix)
+            if description is None:
+                continue
+            kind, width, access, dtype = description
+            address = getattr(modAddr, name)
+            owner = owners.get(address, set())
+            component = next(iter(owner)) if len(owner) == 1 else default_component
+            registers.append(Register(name, kind, address, width, access, component, dtype))
+        return cls(registers)
+
+    def __getitem__(self, name):
+        return self.registers[name]
+
+    def __contains__(self, name):
+        return name in self.registers
+
+    def select(self, component=None, kind=None):
+        """Get the registers belonging to a component and/or of a kind."""
+        return [
+            register for register in self.registers.values()
+            if (component is None or register.component == component)
+            and (kind is None or register.kind == kind)
+        ]
+
+    def lookup(self, key):
+        """Get a register by name, or by address.
+        Coil addresses are looked up before register addresses, which do not overlap on LiveX PLCs.
+        """
+        if isinstance(key, Register):
+            return key
+        if isinstance(key, str):
+            return self.registers[key]
+        for kind in ('coil', 'input', 'holding'):
+            register = self.by_address.get((kind, key))
+            if register is not None:
+                return register
+        raise KeyError(f"No register at address {key}")
+
+    def block_reader(self, fields, max_gap=8):
+        """Plan block reads for a set of registers.
+        Gaps between them are only read through where they are made up of registers in the map.
+        :param fields: dict of field name to register name or address
+        :param max_gap: most registers not asked for to read through to join two blocks
+        :return: BlockReader returning values by field name
+        """
+        kinds = {'coil': {}, 'input': {}, 'holding': {}}
+        for field, key in fields.items():
+            register = self.lookup(key)
+            kinds[register.kind][field] = register.address
+        return BlockReader(
+            input_registers=kinds['input'], holding_registers=kinds['holding'],
+            coils=kinds['coil'], max_gap=max_gap, mapped=self.mapped
+        )
+
+    def read(self, client, fields):
+        """Read a set of registers in as few requests as possible.
+        :param client: ModbusTcpClient (or mock)
+        :param fields: dict of field name to register name or address
+        :return: dict of field name to value (float, or bool for coils)
+        """
+        plan = tuple(fields.items())
+        reader = self._readers.get(plan)
+        if reader is None:
+            reader = self._readers[plan] = self.block_reader(fields)
+        return reader.read(client)
+
+    def write_batch(self, values):
+        """Turn a set of values to write into as few write requests as possible.
+        Holding registers come before coils, so that 'update' coils act on the new values.
+        :param values: dict of register name or address to value
+        :return: list of (kind, start address, list of values) for contiguous runs of each kind
+        """
+        registers = {}
+        for key, value in values.items():
+            register = self.lookup(key)
+            if register.access != 'rw':
+                raise ValueError(f"Register {register.name} is read-only")
+            registers[register] = value
+
+        batch = []
+        for kind, limit in (('holding', MAX_WRITE_REGISTERS), ('coil', MAX_WRITE_COILS)):
+            run_start, run_end, run = None, None, []
+            ordered = sorted(
+                (register for register in registers if register.kind == kind),
+                key=lambda register: register.address
+            )
+            for register in ordered:
+                end = register.address + register.width
+                if run and register.address == run_end and end - run_start <= limit:
+                    run.append(registers[register])
+                else:
+                    if run:
+                        batch.append((kind, run_start, run))
+                    run_start, run = register.address, [registers[register]]
+                run_end = end
+            if run:
+                batch.append((kind, run_start, run))
+        return batch
+
+    def write(self, client, values):
+        """Write a set of values in as few requests as possible.
+        :param client: ModbusTcpClient (or mock)
+        :param values: dict of register name or address to value
+        :return: list of responses, one per request
+        """
+        responses = []
+        for kind, start, run in self.write_batch(values):
+            if kind == 'coil':
+                responses.append(client.write_coils(start, [bool(value) for value in run], slave=1))
+            else:
+                responses.append(
+                    client.write_registers(start, float_payload(run), slave=1, skip_encode=True)
+                )
+        return responses
+
+_names = [name for name in vars(modAddr) if not name.startswith('_')]
+
+FURNACE_REGISTERS = RegisterMap.from_addresses(
+    [name for name in _names if not name.startswith('trig')],
+    components={
+        'pid_upper': modAddr.addresses_pid_upper,
+        'pid_lower': modAddr.addresses_pid_lower,
+        'gradient': modAddr.gradient_addresses,
+        'aspc': modAddr.aspc_addresses,
+        'thermocouples': {
+            name: getattr(modAddr, name) for name in _names
+            if name.startswith(('thermocouple', 'tcidx', 'number_mcp'))
+            # Heater thermocouple values belong to their PIDs
+            and not name.endswith(('upper_inp', 'lower_inp'))
+        }
+    },
+    extra={
+        'power_output_scale_upper': SUFFIXES['_hold'],
+        'power_output_scale_lower': SUFFIXES['_hold']
+    }
+)
+
+TRIGGER_REGISTERS = RegisterMap.from_addresses(
+    [name for name in _names if name.startswith('trig_')],
+    components={f'trigger_{i}': getattr(modAddr, f'trigger_{i}') for i in range(4)},
+    default_component='trigger'
+)
@@ -0,0 +1,233 @@
+"""
+Run furnace sequences against the simulated furnace, in virtual time.
+
+A FurnaceController is created with the mock client and the SimulatedPLC thermal model, with its
+background tasks off. Sequences (e.g. those in test/config/sequences) are loaded with stand-ins
+for the sequencer functions, and with time.sleep replaced so that sleeping advances a virtual
+clock instead: the simulation, the background read and (while acquiring) the fast data stream are
+stepped through the sleep at the background read interval. An hour-long ramp and hold then runs in
+seconds (waiting on the file writer while acquiring), or at a multiple of real time with --speed.
+
+    python -m livex.sequence_sim test/config/sequences/acquisition_sequences.py \
+        d25_test_acquisition --config test/config/livex.cfg --param target_temp=400
+"""
+import argparse
+import ast
+import configparser
+import logging
+import time
+
+import numpy as np
+
+from livex.furnace.controller import FurnaceController
+from livex.mockModbusClient import MockStreamSource
+
+class VirtualClock():
+    """Clock for the simulation, advanced only by the simulator."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+class VirtualTime():
+    """Stand-in for the time module used by sequences, sleeping in virtual time."""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.epoch = time.time()  # Wall time at the start of the virtual clock
+
+    def sleep(self, seconds):
+        self.simulator.sleep(seconds)
+
+    def time(self):
+        return self.epoch + self.simulator.clock()
+
+    def monotonic(self):
+        return self.simulator.clock()
+
+    perf_counter = monotonic
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+class SimulatedLiveX():
+    """Stand-in for the LiveX acquisition controller, running furnace acquisitions only."""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.acquiring = False
+
+    def start_acquisition(self, acquisitions=[]):
+        """Start the furnace acquisition, if it is one of the acquisitions given."""
+        self.acquiring = True
+        if 'furnace' in acquisitions:
+            self.simulator.furnace._start_acquisition()
+            self.simulator.start_stream()
+        logging.info(f"Simulated acquisition started at {self.simulator.clock():.1f}s")
+
+    def stop_acquisition(self, value=None):
+        """Stop the acquisition."""
+        if self.simulator.furnace.acquiring:
+            self.simulator.furnace._stop_acquisition()
+        self.acquiring = False
+        logging.info(f"Simulated acquisition stopped at {self.simulator.clock():.1f}s")
+
+class SequenceSimulator():
+    """Class to run sequences against a simulated furnace in virtual time."""
+
+    # Values recorded after every step
+    HISTORY = {
+        'temperature_upper': lambda f: f.pid_upper.temperature,
+        'temperature_lower': lambda f: f.pid_lower.temperature,
+        'setpoint_upper': lambda f: f.pid_upper.setpoint,
+        'setpoint_lower': lambda f: f.pid_lower.setpoint,
+        'output_upper': lambda f: f.pid_upper.output,
+        'output_lower': lambda f: f.pid_lower.output,
+        'gradient_actual': lambda f: f.gradient.actual,
+        'acquiring': lambda f: f.acquiring
+    }
+
+    def __init__(self, options=None, speed=0):
+        """Create the simulated furnace.
+        :param options: furnace adapter options, e.g. from the [adapter.furnace] config section
+        :param speed: multiple of real time to run at, or 0 to run as fast as possible
+        """
+        options = {
+            **dict(options or {}),
+            'use_mock_client': 1, 'mock_plc': 'thermal', 'register_cache_ttl': 0,
+            'background_read_task_enable': 0, 'background_stream_task_enable': 0,
+            'stream_live_values': 0
+        }
+        self.speed = speed
+        self.clock = VirtualClock()
+
+        self.furnace = FurnaceController(options)
+        self.plc = self.furnace.mockClient
+        self.plc.clock = self.clock
+        self.plc.time = self.clock()
+        self.furnace.poll_scheduler.clock = self.clock
+        self.livex = SimulatedLiveX(self)
+        self.furnace.livex = self.livex
+        self.stream = MockStreamSource(self.plc)
+
+        self.time = VirtualTime(self)
+        self.history = {'time': [], **{key: [] for key in self.HISTORY}}
+        self.furnace._background_read()
+
+    def sleep(self, seconds):
+        """Advance the simulation through a period of virtual time."""
+        end = self.clock() + seconds
+        while self.clock() < end:
+            step = min(self.furnace.bg_read_task_interval, end - self.clock())
+            self.clock.advance(step)
+            self.plc.run_until(self.clock())
+            if self.furnace.acquiring:
+                due = int(self.clock() * self.furnace.pid_frequency) - self.stream.frames
+                if due > 0:
+                    self.furnace._handle_packets(self.stream.generate(due))
+                # Virtual time runs ahead of the disk, so let the writer catch up
+                while self.furnace.write_queue.queue_depth:
+                    time.sleep(0.001)
+            self.furnace._background_read()
+            self._record()
+            if self.speed:
+                time.sleep(step / self.speed)
+
+    def start_stream(self):
+        """Start the fast data stream from the current time, as the PLC does on acquiring."""
+        self.stream.frames = int(self.clock() * self.furnace.pid_frequency)
+
+    def _record(self):
+        """Record the values in HISTORY at the current virtual time."""
+        self.history['time'].append(self.clock())
+        for key, value in self.HISTORY.items():
+            self.history[key].append(value(self.furnace))
+
+    def load(self, path):
+        """Load a sequence module, with the sequencer functions and virtual time available.
+        :param path: path of the sequence file
+        :return: dict of the module namespace
+        """
+        contexts = {'furnace': self.furnace, 'livex': self.livex}
+        namespace = {
+            '__name__': 'simulated_sequence',
+            'get_context': lambda name: contexts[name],
+            'abort_sequence': lambda: False,
+            'set_progress': lambda *args: None,
+            'log': logging.getLogger('sequence')
+        }
+        with open(path) as file:
+            exec(compile(file.read(), path, 'exec'), namespace)
+        namespace['time'] = self.time  # Replace the time module the sequence imported
+        return namespace
+
+    def run(self, path, name, **kwargs):
+        """Run a sequence to completion.
+        :param path: path of the sequence file
+        :param name: name of the sequence function
+        :param kwargs: sequence parameters
+        :return: dict of arrays of the values recorded at each step, including 'time'
+        """
+        sequence = self.load(path)[name]
+        started = time.perf_counter()
+        virtual_start = self.clock()
+        try:
+            sequence(**kwargs)
+        finally:
+            if self.furnace.acquiring:
+                self.livex.stop_acquisition()
+        logging.info(
+            f"{name} ran {self.clock() - virtual_start:.1f}s of virtual time "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return {key: np.asarray(values) for key, values in self.history.items()}
+
+    def cleanup(self):
+        """Stop the simulated furnace's clients."""
+        self.furnace.cleanup()
+
+def main():
+    """Run a sequence from the command line."""
+    parser = argparse.ArgumentParser(description="Run a furnace sequence in virtual time.")
+    parser.add_argument('path', help="sequence file")
+    parser.add_argument('name', help="sequence function")
+    parser.add_argument('--config', help="odin config file to take [adapter.furnace] options from")
+    parser.add_argument('--param', action='append', default=[], help="sequence parameter as key=value")
+    parser.add_argument('--speed', type=float, default=0, help="multiple of real time, 0 for fastest")
+    parser.add_argument('--output', help="optional .npz file to save the recorded values to")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    options = {}
+    if args.config:
+        config = configparser.ConfigParser(inline_comment_prefixes=('#',))
+        config.read(args.config)
+        options = dict(config['adapter.furnace'])
+    kwargs = {}
+    for param in args.param:
+        key, value = param.split('=', 1)
+        try:
+            kwargs[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            kwargs[key] = value
+
+    simulator = SequenceSimulator(options, speed=args.speed)
+    try:
+        history = simulator.run(args.path, args.name, **kwargs)
+    finally:
+        simulator.cleanup()
+    if args.output:
+        np.savez(args.output, **history)
+    if len(history['time']):
+        print(
+            f"Final temperatures {history['temperature_upper'][-1]:.1f}, "
+            f"{history['temperature_lower'][-1]:.1f} at {history['time'][-1]:.1f}s"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+from collections import deque
+
+import numpy as np
+
+class StreamBuffer():
+    """Fixed-capacity, column-oriented buffer for data received from a stream.
+
+    Every column is a preallocated NumPy array, so decoded batches are copied straight in without
+    creating a Python object per value. The buffer is split into slots (two by default): one slot
+    fills while a previously filled one is written out. A slot handed out by swap() is not filled
+    again until it has been given back with release().
+    """
+
+    def __init__(self, columns, capacity, slots=2):
+        """Initialise the buffer, allocating every slot up front.
+        :param columns: dict of column name to NumPy dtype
+        :param capacity: number of rows held by each slot
+        :param slots: number of slots to allocate, at least two
+        """
+        self.columns = dict(columns)
+        self.capacity = max(int(capacity), 1)
+
+        self._slots = [
+            {key: np.empty(self.capacity, dtype=dtype) for key, dtype in self.columns.items()}
+            for _ in range(max(int(slots), 2))
+        ]
+        self._free = deque(range(1, len(self._slots)))
+        self._active = 0
+        self.count = 0  # Rows in the active slot
+
+    def __len__(self):
+        """Return the number of rows in the slot being filled."""
+        return self.count
+
+    @property
+    def full(self):
+        """Whether the slot being filled has reached capacity."""
+        return self.count >= self.capacity
+
+    def extend(self, batch, start=0):
+        """Copy rows from a batch of columns into the slot being filled.
+        :param batch: dict of equal-length arrays, with an entry for every column
+        :param start: index of the first row of the batch to copy
+        :return: number of rows copied, fewer than offered if the slot filled up
+        """
+        slot = self._slots[self._active]
+        rows = 0
+        for key, column in slot.items():
+            values = batch[key]
+            rows = min(len(values) - start, self.capacity - self.count)
+            column[self.count:self.count + rows] = values[start:start + rows]
+
+        self.count += rows
+        return rows
+
+    def view(self):
+        """Get the rows of the slot being filled, as a dict of column views."""
+        return {key: column[:self.count] for key, column in self._slots[self._active].items()}
+
+    def swap(self):
+        """Hand out the rows of the slot being filled, and start filling a free slot.
+        :return: tuple of (slot index, dict of column views), or None if no slot is free
+        """
+        if not self._free:
+            return None
+
+        slot = self._active
+        data = self.view()
+
+        self._active = self._free.popleft()
+        self.count = 0
+        return slot, data
+
+    def release(self, slot):
+        """Return a slot handed out by swap() so that it can be filled again."""
+        self._free.append(slot)
+
+    def clear(self):
+        """Discard the rows in the slot being filled."""
+        self.count = 0
@@ -0,0 +1,75 @@
+import logging
+
+from tornado.ioloop import IOLoop
+from tornado.iostream import IOStream, StreamClosedError
+
+class IOStreamReader():
+    """Class to read the furnace TCP stream from the Tornado IOLoop as data arrives.
+
+    Instead of a thread polling the socket and sleeping in between, the socket is wrapped in an
+    IOStream and read with read_into straight into the reassembler's buffer. The IOLoop only wakes
+    the reader when bytes arrive, so latency is set by the network rather than a polling interval,
+    and no CPU is used while the stream is idle.
+    Each run of complete packets is passed to a callback, which runs on the IOLoop and so should
+    not block (e.g. hand data to a queued file writer rather than writing it itself).
+    """
+
+    def __init__(self, reassembler, on_packets, on_error=None):
+        """Initialise the reader. Reading starts when start() is called with a connected socket.
+        :param reassembler: StreamReassembler to receive into
+        :param on_packets: callable taking bytes of one or more whole packets
+        :param on_error: optional callable taking the exception that stopped the stream
+        """
+        self.reassembler = reassembler
+        self.on_packets = on_packets
+        self.on_error = on_error
+
+        self.io_loop = None
+        self.stream = None
+        self.reading = False
+
+    def start(self, sock):
+        """Start reading from a connected socket on the current IOLoop.
+        The IOStream takes over the socket and puts it in non-blocking mode.
+        :param sock: connected socket.socket
+        """
+        self.io_loop = IOLoop.current()
+        self.stream = IOStream(sock)
+        self.reading = True
+        self.io_loop.add_callback(self._run)
+
+    def stop(self):
+        """Stop reading. This closes the IOStream and the socket with it.
+        Safe to call from any thread.
+        """
+        self.reading = False
+        if self.io_loop and self.stream:
+            self.io_loop.add_callback(self.stream.close)
+
+    async def _run(self):
+        """Read until stopped or the stream closes, passing on complete packets as they arrive."""
+        stream = self.stream
+        try:
+            while self.reading and stream is self.stream:
+                # Hold on to the reassembler being read into, in case it is replaced meanwhile
+                reassembler = self.reassembler
+                received = await stream.read_into(reassembler.writable(), partial=True)
+                reassembler.commit(received)
+                packets = reassembler.take()
+                while packets:
+                    self.on_packets(packets)
+                    packets = reassembler.take()
+        except StreamClosedError as e:
+            # Only an error if this stream was still wanted, i.e. not stopped or replaced
+            if self.reading and stream is self.stream:
+                logging.debug(f"Stream closed: {e.real_error or 'connection closed by PLC'}")
+                self.reading = False
+                if self.on_error:
+                    self.on_error(e)
+        except Exception as e:
+            logging.error(f"Error reading stream: {e}")
+            self.reading = False
+            stream.close()
+            if self.on_error:
+                self.on_error(e)
+        logging.debug("Stream reader stopping")
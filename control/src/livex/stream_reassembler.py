@@ -0,0 +1,156 @@
+import logging
+import struct
+
+import numpy as np
+
+class StreamReassembler():
+    """Reassemble whole packets from the furnace TCP stream.
+
+    TCP makes no promise that a recv returns exactly one packet: reads can be short or hold several
+    packets at once. Bytes are received with recv_into straight into a preallocated buffer and only
+    complete packets are handed on, with any partial packet kept until the rest of it arrives.
+    Alignment is checked against the frame counter in each packet. If the frames stop making sense
+    the stream is resynchronised, and the number of bytes thrown away doing so is counted.
+    """
+
+    def __init__(self, packet_decoder, capacity, max_frame_step=1000):
+        """Initialise the reassembler and its receive buffer.
+        :param packet_decoder: LiveXPacketDecoder defining the packet size and frame position
+        :param capacity: size of the receive buffer in packets (minimum of 4)
+        :param max_frame_step: largest frame increase between packets still treated as aligned
+        """
+        self.packet_size = packet_decoder.size
+        self.max_frame_step = max_frame_step
+
+        # Position of the frame counter in the packet, in bytes and in floats
+        frame_dtype, self.frame_offset = packet_decoder.dtype.fields['frame'][:2]
+        self.frame_struct = struct.Struct(frame_dtype.char)
+        self.frame_dtype = frame_dtype
+        self.floats_per_packet = self.packet_size // frame_dtype.itemsize
+
+        self.capacity = max(int(capacity), 4)
+        self.buffer = bytearray(self.capacity * self.packet_size)
+        self.view = memoryview(self.buffer)
+
+        self.start = 0  # First byte not yet handed on
+        self.end = 0  # End of received data
+        self.last_frame = None
+
+        self.received_bytes = 0
+        self.discarded_bytes = 0
+        self.resync_count = 0
+
+    def reset(self):
+        """Empty the buffer, e.g. at the start of an acquisition. Counters are also reset."""
+        self.start = 0
+        self.end = 0
+        self.last_frame = None
+        self.received_bytes = 0
+        self.discarded_bytes = 0
+        self.resync_count = 0
+
+    def recv(self, sock):
+        """Receive from a socket into the buffer and return any complete packets.
+        :param sock: socket-like object providing recv_into
+        :return: bytes of zero or more whole, aligned packets
+        """
+        received = sock.recv_into(self.writable())
+        if not received:
+            raise ConnectionError("connection closed by PLC")
+        self.commit(received)
+        return self.take()
+
+    def writable(self):
+        """Return a memoryview of the free space at the end of the buffer.
+
+        Any bytes still waiting to complete a packet are moved to the front of the buffer first.
+        There are fewer than two packets' worth of these, so the move is cheap.
+        """
+        if self.start:
+            pending = self.end - self.start
+            self.buffer[:pending] = self.view[self.start:self.end]
+            self.start = 0
+            self.end = pending
+        return self.view[self.end:]
+
+    def commit(self, count):
+        """Mark a number of bytes written into the writable() view as received."""
+        self.end += count
+        self.received_bytes += count
+
+    def take(self):
+        """Return all complete, aligned packets received so far and remove them from the buffer."""
+        while True:
+            available = (self.end - self.start) // self.packet_size
+            if not available:
+                return b''
+
+            # Strided view of the frame counter of every complete packet
+            frames = np.frombuffer(
+                self.buffer, dtype=self.frame_dtype, offset=self.start,
+                count=available * self.floats_per_packet
+            )[self.frame_offset // self.frame_dtype.itemsize::self.floats_per_packet]
+
+            aligned = self._aligned(frames, self.last_frame)
+            if not aligned and self.last_frame is not None and self._aligned(frames[:2]) == 2:
+                # Packets still line up with each other, so the frame counter itself has jumped
+                # (e.g. a dropped, repeated or late frame). Leave that for the frame tracker
+                aligned = self._aligned(frames)
+            if aligned:
+                packets = bytes(self.view[self.start:self.start + aligned * self.packet_size])
+                self.start += aligned * self.packet_size
+                self.last_frame = float(frames[aligned - 1])
+                return packets
+
+            # Head of the buffer is not a valid packet, look for where the packets really start
+            if not self._resync():
+                return b''
+
+    def _aligned(self, frames, previous=None):
+        """Return how many packets from the start of the buffer have plausible frame counters.
+
+        Frames must be whole, non-negative numbers, each a small step above the one before. Past
+        2**24 a float32 counter can no longer tell consecutive frames apart, so there a frame equal
+        to the one before is allowed too.
+        :param frames: array of frame counters, one per packet
+        :param previous: frame of the packet before these, if known
+        """
+        if previous is None:
+            previous = frames[0] - 1
+        steps = np.diff(frames, prepend=previous)
+        unresolved = np.spacing(np.abs(frames)) > 1  # Counter steps by more than one frame
+        valid = (
+            np.isfinite(frames) & (frames >= 0) & (frames == np.floor(frames))
+            & ((steps > 0) | ((steps == 0) & unresolved)) & (steps <= self.max_frame_step)
+        )
+        invalid = np.flatnonzero(~valid)
+        return int(invalid[0]) if invalid.size else len(frames)
+
+    def _resync(self):
+        """Discard bytes from the head of the buffer until two consecutive frames line up.
+        :return: True if alignment was found, False if more data is needed
+        """
+        data = self.view[self.start:self.end]
+        last_offset = len(data) - 2 * self.packet_size
+
+        for offset in range(last_offset + 1):
+            first, = self.frame_struct.unpack_from(data, offset + self.frame_offset)
+            second, = self.frame_struct.unpack_from(
+                data, offset + self.packet_size + self.frame_offset
+            )
+            if self._aligned(np.array([first, second], dtype=self.frame_dtype)) == 2:
+                self._discard(offset)
+                self.resync_count += 1
+                self.last_frame = None
+                return True
+
+        # Nothing found, but keep a tail that could still be the start of an aligned pair
+        self._discard(max(last_offset + 1, 0))
+        return False
+
+    def _discard(self, count):
+        """Drop bytes from the head of the buffer and count them."""
+        if count:
+            logging.debug(f"Stream resync discarded {count} bytes")
+        self.start += count
+        self.discarded_bytes += count
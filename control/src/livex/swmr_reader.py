@@ -0,0 +1,61 @@
+"""
+Reader for furnace HDF5 files that are still being written.
+
+When the furnace adapter writes in SWMR (single-writer/multiple-reader) mode, analysis scripts can
+follow an acquisition as it happens by opening the file with this reader and calling read_new
+periodically, rather than polling the parameter tree.
+
+    with SwmrReader('/tmp/experiment_furnace.h5') as reader:
+        while acquiring:
+            new_rows = reader.read_new()
+            ...
+"""
+import h5py
+
+class SwmrReader():
+    """Class to follow a group of an HDF5 file being written in SWMR mode, reading new rows."""
+
+    def __init__(self, path, groupname='fast_data', keys=None):
+        """Open the file for reading alongside the writer.
+        :param path: path to the HDF5 file
+        :param groupname: group of equal-length datasets to follow
+        :param keys: optional list of dataset names to read, all datasets in the group by default
+        """
+        self.file = h5py.File(path, 'r', libver='latest', swmr=True)
+        self.group = self.file[groupname]
+        self.keys = keys or list(self.group.keys())
+        self.index = 0  # First row not yet returned
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def available(self):
+        """Refresh the datasets and return the number of rows written to all of them so far."""
+        for key in self.keys:
+            self.group[key].refresh()
+        # Datasets are extended one after another, so only count rows that every one holds
+        return min(self.group[key].shape[0] for key in self.keys)
+
+    def read_new(self, max_rows=None):
+        """Read the rows written since the previous call.
+        :param max_rows: optional limit on the number of rows returned
+        :return: dict of dataset name to array of new rows (empty if nothing new)
+        """
+        end = self.available()
+        if max_rows is not None:
+            end = min(end, self.index + max_rows)
+
+        data = {key: self.group[key][self.index:end] for key in self.keys}
+        self.index = end
+        return data
+
+    def seek(self, index):
+        """Set the row that the next read_new call starts from."""
+        self.index = index
+
+    def close(self):
+        """Close the file."""
+        self.file.close()
@@ -0,0 +1,242 @@
+"""
+Simulation of the furnace heaters and their PID control, for testing without the furnace.
+
+The two heater zones and the extra thermocouples are held as NumPy arrays, with an optional
+leading batch dimension so that many independent furnaces (e.g. different PID gains) can be
+simulated in one go. SimulatedPLC runs one furnace against the registers of a MockModbusClient in
+place of MockPLC, covering both PIDs, the thermal gradient and auto set point control. It steps in
+virtual time, so it can be run from a simulation clock much faster than real time.
+"""
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from livex.modbusAddresses import modAddr
+
+@dataclass
+class ThermalParameters:
+    """Constants of the thermal model. Rates are per second."""
+    room: float = 25.0  # Ambient temperature
+    heat_gain: float = 5.0  # Heating rate at full output
+    loss: float = 0.004  # Fraction of the difference from room temperature lost
+    coupling: float = 0.01  # Fraction of the difference between heaters passed between them
+    sensor_lag: float = 2.0  # Time constant of the heater thermocouples
+    extra_lag: float = 10.0  # Time constant of the extra thermocouples
+    # Position of each extra thermocouple between the upper (0) and lower (1) heater
+    extra_positions: tuple = field(default=(0.2, 0.4, 0.6, 0.8))
+
+class ThermalModel():
+    """Temperatures of the two heaters (upper, lower) and the extra thermocouples.
+
+    Each heater element is heated by the square of its (scaled) output, loses heat to the room and
+    exchanges heat with the other heater. The heater thermocouples follow their element with a lag,
+    and each extra thermocouple follows a point on the line between the two heater thermocouples.
+    """
+
+    def __init__(self, params=None, batch=()):
+        """Initialise the model at room temperature.
+        :param params: ThermalParameters, the defaults if not given
+        :param batch: shape of the batch of furnaces simulated together, () for one
+        """
+        self.params = params or ThermalParameters()
+        self.batch = tuple(np.atleast_1d(batch)) if batch != () else ()
+        self.positions = np.asarray(self.params.extra_positions, dtype=float)
+        self.reset()
+
+    def reset(self, temperature=None, extra=None):
+        """Set every temperature, to room temperature by default.
+        :param temperature: optional heater temperatures, broadcastable to (*batch, 2)
+        :param extra: optional extra thermocouple temperatures, interpolated if not given
+        """
+        temperature = self.params.room if temperature is None else temperature
+        self.element = np.broadcast_to(np.asarray(temperature, dtype=float), self.batch + (2,)).copy()
+        self.sensor = self.element.copy()
+        if extra is None:
+            self.extra = self._interpolate(self.sensor)
+        else:
+            self.extra = np.broadcast_to(
+                np.asarray(extra, dtype=float), self.batch + self.positions.shape
+            ).copy()
+
+    def _interpolate(self, sensor):
+        """Temperatures along the line between the heaters, at the extra thermocouple positions."""
+        return sensor[..., :1] + (sensor[..., 1:] - sensor[..., :1]) * self.positions
+
+    def step(self, power, dt):
+        """Advance the model.
+        :param power: heater outputs scaled by their power output scale, 0 to 1, shape (*batch, 2)
+        :param dt: time step in seconds
+        """
+        p = self.params
+        element = self.element
+        heating = p.heat_gain * np.square(power)
+        exchange = p.coupling * (element[..., ::-1] - element)
+        element += dt * (heating - p.loss * (element - p.room) + exchange)
+        self.sensor += (element - self.sensor) * min(dt / p.sensor_lag, 1)
+        self.extra += (self._interpolate(self.sensor) - self.extra) * min(dt / p.extra_lag, 1)
+
+class PIDArray():
+    """Array of PID controllers, computed as the furnace PLC does.
+
+    Integral and derivative gains are per second and scaled by the sample time, the integral sum
+    and the output are limited to 0-1, and the derivative acts on the measurement rather than the
+    error, so that setpoint changes do not kick the output.
+    """
+
+    def __init__(self, kp, ki, kd, shape=()):
+        """Initialise the controllers.
+        :param kp, ki, kd: gains, broadcastable to shape
+        :param shape: shape of the array of controllers
+        """
+        self.kp = np.broadcast_to(np.asarray(kp, dtype=float), shape)
+        self.ki = np.broadcast_to(np.asarray(ki, dtype=float), shape)
+        self.kd = np.broadcast_to(np.asarray(kd, dtype=float), shape)
+        self.shape = shape
+        self.reset()
+
+    def reset(self):
+        """Clear the integral sum and the last input."""
+        self.outputsum = np.zeros(self.shape)
+        self.output = np.zeros(self.shape)
+        self.last_input = None
+
+    def update(self, setpoint, measured, dt, enable=True):
+        """Calculate new outputs.
+        :param setpoint: setpoints, broadcastable to shape
+        :param measured: measured temperatures, broadcastable to shape
+        :param dt: sample time in seconds
+        :param enable: bool or boolean array; disabled controllers output 0 and are reset
+        :return: array of outputs
+        """
+        error = setpoint - measured
+        d_input = 0 if self.last_input is None else measured - self.last_input
+        self.last_input = np.array(measured, dtype=float)
+
+        self.outputsum = np.clip(self.outputsum + self.ki * dt * error, 0, 1)
+        output = np.clip(self.kp * error + self.outputsum - self.kd / dt * d_input, 0, 1)
+
+        self.outputsum = np.where(enable, self.outputsum, 0)
+        self.output = np.where(enable, output, 0)
+        return self.output
+
+class SimulatedPLC():
+    """Simulated furnace PLC driving the registers of a MockModbusClient, in place of MockPLC.
+
+    Each step reads the control registers (enables, setpoints, gains, gradient, auto set point
+    control and output overrides), runs both PIDs and the thermal model for one PID period
+    (1/furnace frequency), and writes the results back to the input registers. Setpoints are
+    ramped by auto set point control as on the PLC, and a thermal gradient adds half its size to
+    the setpoint of the high heater and takes it from the other.
+    """
+
+    def __init__(self, mockClient, params=None, clock=time.monotonic):
+        """Initialise the simulation.
+        :param mockClient: MockModbusClient holding the furnace registers
+        :param params: optional ThermalParameters
+        :param clock: function giving the time in seconds that the simulation is run up to
+        """
+        self.client = mockClient
+        self.model = ThermalModel(params)
+        self.pid = PIDArray(0, 0, 0, shape=(2,))
+        self.clock = clock
+        self.time = clock()
+        self.steps = 0
+        self._write_inputs()
+
+    # Values used by the mock stream clients, as on MockPLC
+
+    @property
+    def temp(self):
+        return float(self.model.sensor[0])
+
+    @property
+    def output(self):
+        return float(self.pid.output[0])
+
+    @property
+    def outputSum(self):
+        return float(self.pid.outputsum[0])
+
+    def bg_temp_task(self):
+        """Run the simulation up to the current time of its clock."""
+        self.run_until(self.clock())
+
+    def run_until(self, until):
+        """Step the simulation until a given time, in whole PID periods."""
+        while True:
+            dt = 1 / max(float(self.client.registers.get(modAddr.furnace_freq_hold, 10)), 1e-3)
+            if self.time + dt > until:
+                break
+            self.step(dt)
+            self.time += dt
+
+    def _pair(self, upper, lower, default=0.0):
+        """Get the values of an upper and lower heater register as an array."""
+        registers = self.client.registers
+        return np.array((registers.get(upper, default), registers.get(lower, default)), dtype=float)
+
+    def step(self, dt):
+        """Advance the simulation by one PID period of dt seconds."""
+        registers = self.client.registers
+
+        # Auto set point control ramps both setpoints, within the setpoint limit
+        setpoint = self._pair(modAddr.pid_setpoint_upper_hold, modAddr.pid_lower_setpoint_hold)
+        if registers.get(modAddr.autosp_enable_coil):
+            rate = float(registers.get(modAddr.autosp_rate_hold, 0))
+            if not registers.get(modAddr.autosp_heating_coil):
+                rate = -rate
+            limit = float(registers.get(modAddr.setpoint_limit_hold, 1500))
+            setpoint = np.minimum(setpoint + rate * dt, limit)
+            registers[modAddr.pid_setpoint_upper_hold] = float(setpoint[0])
+            registers[modAddr.pid_lower_setpoint_hold] = float(setpoint[1])
+
+        theoretical = (
+            float(registers.get(modAddr.gradient_wanted_hold, 0))
+            * float(registers.get(modAddr.gradient_distance_hold, 0))
+        )
+        high = 1 if registers.get(modAddr.gradient_high_coil) else 0
+        if registers.get(modAddr.gradient_enable_coil):
+            setpoint[high] += theoretical / 2
+            setpoint[1 - high] -= theoretical / 2
+
+        self.pid.kp = self._pair(modAddr.pid_kp_upper_hold, modAddr.pid_lower_kp_hold)
+        self.pid.ki = self._pair(modAddr.pid_ki_upper_hold, modAddr.pid_lower_ki_hold)
+        self.pid.kd = self._pair(modAddr.pid_kd_upper_hold, modAddr.pid_lower_kd_hold)
+        enable = self._pair(modAddr.pid_upper_enable_coil, modAddr.pid_lower_enable_coil) > 0
+        output = self.pid.update(setpoint, self.model.sensor, dt, enable)
+
+        override = self._pair(modAddr.output_override_upper_coil, modAddr.output_override_lower_coil) > 0
+        if override.any():
+            output = np.where(
+                override,
+                self._pair(modAddr.output_override_upper_hold, modAddr.output_override_lower_hold),
+                output
+            )
+        scale = self._pair(modAddr.power_output_scale_upper, modAddr.power_output_scale_lower, 1.0)
+        self.model.step(np.clip(output, 0, 1) * scale, dt)
+
+        self.steps += 1
+        registers[modAddr.counter_inp] = self.steps
+        registers[modAddr.gradient_theory_inp] = theoretical
+        registers[modAddr.gradient_actual_inp] = float(
+            self.model.sensor[high] - self.model.sensor[1 - high]
+        )
+        registers[modAddr.autosp_midpt_inp] = float(setpoint.mean())
+        registers[modAddr.pid_upper_output_inp] = float(output[0])
+        registers[modAddr.pid_lower_output_inp] = float(output[1])
+        registers[modAddr.pid_upper_outputsum_inp] = float(self.pid.outputsum[0])
+        registers[modAddr.pid_lower_outputsum_inp] = float(self.pid.outputsum[1])
+        self._write_inputs()
+
+    def _write_inputs(self):
+        """Write the thermocouple temperatures to their input registers."""
+        registers = self.client.registers
+        registers[modAddr.thermocouple_upper_inp] = float(self.model.sensor[0])
+        registers[modAddr.thermocouple_lower_inp] = float(self.model.sensor[1])
+        for address, value in zip(
+            (modAddr.thermocouple_extra_a_inp, modAddr.thermocouple_extra_b_inp,
+             modAddr.thermocouple_extra_c_inp, modAddr.thermocouple_extra_d_inp),
+            self.model.extra
+        ):
+            registers[address] = float(value)
@@ -12,6 +12,10 @@ from livex.util import (
     write_modbus_float,
 )
 from livex.mockModbusClient import MockModbusClient
+from livex.write_batch import BatchingClient
+from livex.register_map import TRIGGER_REGISTERS
+from livex.async_modbus import AsyncModbusBackend
+from livex.command_queue import CommandQueue, QueuedClient
 
 from .trigger import Trigger
 
@@ -23,9 +27,18 @@ class TriggerController(BaseController):
         # Parse options and build trigger objects
         self.ip = options.get('ip', None)
         self.port = int(options.get('port', '4444'))
+        self.modbus_port = int(options.get('modbus_port', 502))
         self.status_bg_task_enable = int(options.get('status_bg_task_enable', 1))
         self.status_bg_task_interval = int(options.get('status_bg_task_interval', 10))
         self.mocking = bool(int(options.get('use_mock_client', 0)))
+        # Status polling can block the IOLoop while waiting for the device (sync), or be run on a
+        # command queue worker thread that all requests then go through (async)
+        self.modbus_backend = str(options.get('modbus_backend', 'sync')).strip().lower()
+        if self.modbus_backend not in ('sync', 'async'):
+            logging.warning(f"Unknown modbus_backend {self.modbus_backend}. Defaulting to sync.")
+            self.modbus_backend = 'sync'
+        self.command_queue = CommandQueue() if self.modbus_backend == 'async' else None
+        self.async_client = None
 
         self.triggers = {}
         names = options.get('triggers', None).split(",")
@@ -36,6 +49,13 @@ class TriggerController(BaseController):
             addresses = getattr(modAddr, addr)
             self.triggers[name] = Trigger(name, addresses)
 
+        # Status registers of every trigger, polled together: the running coils are adjacent, as
+        # are the interval and target registers, so this takes one coil read and one block read
+        self.status_reader = TRIGGER_REGISTERS.block_reader({
+            f'{name}/{key}': trigger.addr[key]
+            for name, trigger in self.triggers.items() for key in Trigger.STATUS_FIELDS
+        })
+
         # Initialise the modbus client and get all register values
         self.initialise_client(value=None)
         self._get_all_registers()
@@ -57,7 +77,12 @@ class TriggerController(BaseController):
             'modbus': {
                 'ip': (lambda: self.ip, self.set_ip),
                 'connected': (lambda: self.connected, None),
-                'reconnect': (lambda: None, self.initialise_client)
+                'reconnect': (lambda: None, self.initialise_client),
+                'backend': (lambda: self.modbus_backend, None),
+                'round_trips': (lambda: self.status_reader.round_trips, None),
+                'read_duration': (lambda: self.status_reader.duration, None),
+                'requests': (lambda: self.async_client.requests if self.async_client else None, None),
+                'latency': (lambda: self.async_client.latency if self.async_client else None, None)
             }
         })
 
@@ -81,6 +106,8 @@ class TriggerController(BaseController):
         correctly.
         """
         self.mod_client.close()
+        if self.command_queue:
+            self.command_queue.close()
 
     def get(self, path: str, with_metadata: bool = False):
         """Get the parameter tree.
@@ -118,7 +145,13 @@ class TriggerController(BaseController):
             else:
                 log = logging.getLogger('pymodbus')
                 log.setLevel(logging.ERROR)
-                self.mod_client = ModbusTcpClient(self.ip)
+                self.mod_client = ModbusTcpClient(self.ip, port=self.modbus_port)
+            if self.modbus_backend == 'async':
+                # Polls and writes share the one connection, used only by the queue worker
+                self.async_client = AsyncModbusBackend(self.mod_client, self.command_queue)
+                self.mod_client = QueuedClient(self.mod_client, self.command_queue)
+            # Writes made inside mod_client.batch() are sent together
+            self.mod_client = BatchingClient(self.mod_client)
             self.mod_client.connect()
             self.connected = True
             # With connection established, update any registers
@@ -130,10 +163,30 @@ class TriggerController(BaseController):
             self.connected = False
 
     def _get_all_registers(self):
-        """Read the value of all registers to update the tree."""
+        """Read the status registers of every trigger together to update the tree."""
         if self.connected:
-            for name, trigger in self.triggers.items():
-                trigger._get_parameters()
+            self._update_triggers(self.status_reader.read(self.mod_client))
+
+    async def _get_all_registers_async(self):
+        """Read the status registers of every trigger together to update the tree, waiting for
+        the command queue worker rather than blocking the IOLoop. Used for polling when the async
+        backend is selected.
+        """
+        if not (self.connected and self.async_client):
+            return
+        try:
+            values = await self.async_client.run(self.status_reader.read, self.async_client.client)
+        except Exception as e:
+            logging.debug(f"Error when polling trigger registers: {e}")
+            return
+        self._update_triggers(values)
+
+    def _update_triggers(self, values):
+        """Update every trigger from the values read by the status reader."""
+        for name, trigger in self.triggers.items():
+            trigger._update_parameters({
+                key: values[f'{name}/{key}'] for key in Trigger.STATUS_FIELDS
+            })
 
     def set_all_timers(self, values):
         """Enable or disable all timers.
@@ -154,28 +207,31 @@ class TriggerController(BaseController):
         # If freerun, write the target as 0 to the trigger without setting the target count.
         # This is to avoid users needing to re-enter the value if the change their mind.
         # The acquisition start still overrides the target if freerun is enabled.
-        if freerun:
-            for trigger in self.triggers.values():
-                write_modbus_float(self.mod_client, 0, trigger.addr['target_hold'])
-        else:
-            for trigger in self.triggers.values():
-                write_modbus_float(self.mod_client, trigger.target, trigger.addr['target_hold'])
+        # Targets are adjacent registers, so are sent as one write along with the enable coil
+        with self.mod_client.batch():
+            if freerun:
+                for trigger in self.triggers.values():
+                    write_modbus_float(self.mod_client, 0, trigger.addr['target_hold'])
+            else:
+                for trigger in self.triggers.values():
+                    write_modbus_float(self.mod_client, trigger.target, trigger.addr['target_hold'])
 
-        if self.all_triggers_enable:
-            logging.debug("Enabling all timers.")
-            write_coil(self.mod_client, modAddr.trig_enable_coil, True)
-        else:
-            logging.debug("Disabling all timers.")
-            write_coil(self.mod_client, modAddr.trig_disable_coil, True)  # Coil needs True val
+            if self.all_triggers_enable:
+                logging.debug("Enabling all timers.")
+                write_coil(self.mod_client, modAddr.trig_enable_coil, True)
+            else:
+                logging.debug("Disabling all timers.")
+                write_coil(self.mod_client, modAddr.trig_disable_coil, True)  # Coil needs True val
 
     # Background task functions
 
     def start_background_tasks(self):
         """Start the background tasks and reset the continuous error counter."""
         logging.debug(f"Launching trigger status update task with interval {self.status_bg_task_interval}.")
-        self.status_ioloop_task = PeriodicCallback(
-            self._get_all_registers, (self.status_bg_task_interval * 1000)
-        )
+        poll = self._get_all_registers
+        if self.modbus_backend == 'async':
+            poll = self._get_all_registers_async
+        self.status_ioloop_task = PeriodicCallback(poll, (self.status_bg_task_interval * 1000))
         self.status_ioloop_task.start()
 
     def stop_background_tasks(self):
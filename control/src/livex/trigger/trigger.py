@@ -1,11 +1,14 @@
 from odin.adapters.parameter_tree import ParameterTree
-from livex.util import read_decode_holding_reg, write_modbus_float, write_coil, read_coil
+from livex.util import write_modbus_float, write_coil
+from livex.register_map import TRIGGER_REGISTERS
 import logging
 
 class Trigger():
     """This class provides the ParameterTree for the trigger controls for LiveX.
     It stores relevant values and provides functions to control a given trigger output via modbus.
     """
+    # Registers read to get the status of a trigger
+    STATUS_FIELDS = ('running_coil', 'freq_hold', 'target_hold')
 
     def __init__(self, name, addresses):
 
@@ -33,9 +36,18 @@ class Trigger():
 
     def _get_parameters(self):
         """Read modbus registers to get the most recent values for the trigger."""
-        self.running = read_coil(self.client, self.addr['running_coil'])
-        self.frequency = float(read_decode_holding_reg(self.client, self.addr['freq_hold']))
-        self.target = int(read_decode_holding_reg(self.client, self.addr['target_hold']))
+        values = TRIGGER_REGISTERS.read(self.client, {
+            key: self.addr[key] for key in self.STATUS_FIELDS
+        })
+        self._update_parameters(values)
+
+    def _update_parameters(self, values):
+        """Update the trigger from values read from its STATUS_FIELDS registers.
+        :param values: dict of value by field name (e.g. 'running_coil')
+        """
+        self.running = values['running_coil']
+        self.frequency = float(values['freq_hold'])
+        self.target = int(values['target_hold'])
 
     def _update_hold_value(self, address, value):
         """Write a value to a given holding register(s) and mark the 'value updated' coil."""
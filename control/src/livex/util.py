@@ -3,7 +3,6 @@ Utilities for the LiveX adapters.
 
 Mika Shearwood, STFC Detector Systems Software Group
 """
-from pymodbus.payload import BinaryPayloadDecoder
 from pymodbus.payload import BinaryPayloadBuilder
 from pymodbus.constants import Endian
 from odin.adapters.adapter import ApiAdapterRequest
@@ -11,19 +10,30 @@ from odin.adapters.adapter import ApiAdapterRequest
 import logging
 import math
 
+from livex.codec import decode_float, float_payload
+
 class LiveXError(Exception):
     """Simple exception class to wrap lower-level exceptions."""
     pass
 
 
+def _cached(client, kind, address, count):
+    """Get fresh values from the client's register cache, if it has one, or None."""
+    cache = getattr(client, 'cache', None)
+    return cache.get(kind, address, count) if cache is not None else None
+
 def read_coil(client, address, asInt=False):
-    """Read and return the value from the coil at the specified address, optionally as an int."""
-    response = client.read_coils(address, count=1, slave=1)
+    """Read and return the value from the coil at the specified address, optionally as an int.
+    A fresh value in the client's register cache is used instead of reading, if there is one.
+    """
+    bits = _cached(client, 'coil', address, 1)
+    if bits is None:
+        bits = client.read_coils(address, count=1, slave=1).bits
 
     if asInt:
-        return (1 if response.bits[0] else 0)  # 1 if true, 0 if not
+        return (1 if bits[0] else 0)  # 1 if true, 0 if not
     else:
-        return response.bits[0]  # read_coils pads to eight with zeroes.
+        return bits[0]  # read_coils pads to eight with zeroes.
 
 def write_coil(client, address, value=0):
     """Write a boolean value to a coil at the specified address."""
@@ -32,13 +42,12 @@ def write_coil(client, address, value=0):
 
 def read_decode_input_reg(client, address):
     """Read and decode a float value from a given input register address (two registers).
-    Return the decoded value.
+    Return the decoded value. A fresh value in the client's register cache is used if there is one.
     """
-    response = client.read_input_registers(address, count=2, slave=1)
-    decoder = BinaryPayloadDecoder.fromRegisters(
-        response.registers, wordorder=Endian.LITTLE, byteorder=Endian.BIG
-    )
-    value = decoder.decode_32bit_float()
+    registers = _cached(client, 'input', address, 2)
+    if registers is None:
+        registers = client.read_input_registers(address, count=2, slave=1).registers
+    value = decode_float(registers)
 
     if math.isnan(value):  # Error is hard to reproduce but good to account for
         logging.debug(f"ISNAN when reading from address {address}")
@@ -47,13 +56,12 @@ def read_decode_input_reg(client, address):
 
 def read_decode_holding_reg(client, address):
     """Read and decode a float value from a given holding register address (two registers).
-    Return the decoded value.
+    Return the decoded value. A fresh value in the client's register cache is used if there is one.
     """
-    response = client.read_holding_registers(address, count=2, slave=1)
-    decoder = BinaryPayloadDecoder.fromRegisters(
-        response.registers, wordorder=Endian.LITTLE, byteorder=Endian.BIG
-    )
-    value = decoder.decode_32bit_float()
+    registers = _cached(client, 'holding', address, 2)
+    if registers is None:
+        registers = client.read_holding_registers(address, count=2, slave=1).registers
+    value = decode_float(registers)
 
     if math.isnan(value):
         logging.debug(f"ISNAN when reading from address {address}")
@@ -69,9 +77,13 @@ def write_modbus_float(client, value, address, byteorder=Endian.BIG, wordorder=E
     :param wordorder: order of 'words' (default little endian)
     :return response: write status
     """
-    builder = BinaryPayloadBuilder(byteorder=byteorder, wordorder=wordorder)
-    builder.add_32bit_float(float(value)) # float(value) avoids checking variable type, no effect
-    payload = builder.build()
+    if byteorder == Endian.BIG and wordorder == Endian.LITTLE:
+        # LiveX order, encoded with the precompiled codec
+        payload = float_payload(float(value))
+    else:
+        builder = BinaryPayloadBuilder(byteorder=byteorder, wordorder=wordorder)
+        builder.add_32bit_float(float(value)) # float(value) avoids checking variable type, no effect
+        payload = builder.build()
 
     response = client.write_registers(
         address, payload, slave=1, skip_encode=True
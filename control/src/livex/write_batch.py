@@ -0,0 +1,152 @@
+import contextlib
+import logging
+import struct
+import threading
+
+# Largest number of registers and coils a single Modbus write request can hold
+MAX_WRITE_REGISTERS = 123
+MAX_WRITE_COILS = 1968
+
+_WORD = struct.Struct('>H')
+
+class BatchingClient():
+    """Wrapper for a Modbus client that can collect writes and send them in as few requests as
+    possible.
+
+    Outside of a batch, every call goes straight through to the wrapped client. Inside one
+    (with client.batch():), register and coil writes are held back until the batch ends, and then
+    sent in the order they were made. A register write that directly follows another, to the
+    registers just after it or to some of the same ones, is merged into the same write_registers
+    request. Coil writes are never merged or reordered, as coils such as 'update' act as pulses on
+    the PLC. Any read made during a batch flushes the writes held so far first, so reads always see
+    them. If the block raises, the writes still held are discarded rather than sent, so that a
+    sequence failing halfway does not leave the PLC half configured.
+    Batches belong to the thread that opened them; other threads using the client are unaffected.
+    """
+
+    def __init__(self, client):
+        """Wrap a client.
+        :param client: ModbusTcpClient (or mock)
+        """
+        self.client = client
+        self._local = threading.local()
+
+        self.write_requests = 0  # Write requests sent to the client
+        self.batched_writes = 0  # Writes merged into batches
+
+    def __getattr__(self, name):
+        """Pass anything not handled here (e.g. connect, close) to the wrapped client."""
+        return getattr(self.client, name)
+
+    @property
+    def _pending(self):
+        """Writes held by the current thread's batch, or None outside of a batch."""
+        return getattr(self._local, 'pending', None)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Hold writes made inside the block, and send them when the outermost batch ends.
+        Held writes are discarded if the block raises.
+        """
+        outermost = self._pending is None
+        if outermost:
+            self._local.pending = []  # (kind, start address, list of values), in order made
+        try:
+            yield self
+        except BaseException:
+            if outermost and self._pending:
+                logging.warning(f"Discarded {len(self._pending)} held write(s) from a failed batch")
+            raise
+        else:
+            if outermost:
+                self.flush()
+        finally:
+            if outermost:
+                self._local.pending = None
+
+    def flush(self):
+        """Send the writes held by the current batch, in the order they were made."""
+        pending = self._pending
+        if not pending:
+            return
+        writes = list(pending)
+        pending.clear()
+
+        for kind, start, values in writes:
+            self.write_requests += 1
+            if kind == 'registers':
+                self.client.write_registers(start, values, slave=1, skip_encode=True)
+            else:
+                self.client.write_coils(start, values, slave=1)
+
+    def _hold_registers(self, address, words):
+        """Hold a register write, merging it into the write before it where that is safe.
+        :param address: first register address
+        :param words: list of two-byte strings
+        """
+        pending = self._pending
+        if pending and pending[-1][0] == 'registers':
+            _, start, values = pending[-1]
+            offset = address - start
+            if 0 <= offset <= len(values) and offset + len(words) <= MAX_WRITE_REGISTERS:
+                # Continues the previous write, or writes over some of its registers again
+                values[offset:offset + len(words)] = words
+                return
+        pending.append(('registers', address, list(words)))
+
+    # Writes
+
+    def write_registers(self, address, values, slave=1, skip_encode=False):
+        """Write registers, or hold them if a batch is open.
+        :param values: list of register values, or of two-byte strings if skip_encode is set
+        """
+        if self._pending is None:
+            self.write_requests += 1
+            return self.client.write_registers(address, values, slave=slave, skip_encode=skip_encode)
+
+        self._hold_registers(address, [value if skip_encode else _WORD.pack(value) for value in values])
+        self.batched_writes += 1
+
+    def write_register(self, address, value, slave=1):
+        """Write a single register, or hold it if a batch is open."""
+        if self._pending is None:
+            self.write_requests += 1
+            return self.client.write_register(address, value, slave=slave)
+        return self.write_registers(address, [value], slave=slave)
+
+    def write_coils(self, address, values, slave=1):
+        """Write consecutive coils, or hold them if a batch is open."""
+        if self._pending is None:
+            self.write_requests += 1
+            return self.client.write_coils(address, values, slave=slave)
+
+        self._pending.append(('coils', address, [bool(value) for value in values]))
+        self.batched_writes += 1
+
+    def write_coil(self, address, value, slave=1):
+        """Write a single coil, or hold it if a batch is open."""
+        if self._pending is None:
+            self.write_requests += 1
+            return self.client.write_coil(address, value, slave=slave)
+        return self.write_coils(address, [value], slave=slave)
+
+    # Reads see any held writes
+
+    def read_coils(self, *args, **kwargs):
+        self.flush()
+        return self.client.read_coils(*args, **kwargs)
+
+    def read_input_registers(self, *args, **kwargs):
+        self.flush()
+        return self.client.read_input_registers(*args, **kwargs)
+
+    def read_holding_registers(self, *args, **kwargs):
+        self.flush()
+        return self.client.read_holding_registers(*args, **kwargs)
+
+def batch(client):
+    """Get a batch context for a client, or one that sends writes straight away if the client
+    cannot batch them (e.g. a plain ModbusTcpClient).
+    """
+    batch = getattr(client, 'batch', None)
+    return batch() if batch else contextlib.nullcontext(client)
@@ -0,0 +1,32 @@
+from livex.block_read import BlockReader
+from livex.register_map import Register, RegisterMap
+
+
+def holding(name, address):
+    return Register(name, 'holding', address, 2, 'rw', 'furnace', 'float')
+
+
+def planned(reader):
+    return [(kind, start, count, names) for kind, start, count, names, _ in reader.blocks]
+
+
+def test_gaps_are_only_read_through_mapped_registers():
+    registers = RegisterMap([holding('a', 100), holding('b', 102), holding('c', 104),
+                             holding('d', 110)])
+
+    # 102-103 are mapped, so a and c are read together; 106-109 are not, so d is read alone
+    reader = registers.block_reader({'a': 'a', 'c': 'c', 'd': 'd'})
+
+    assert planned(reader) == [
+        ('holding', 100, 6, ['a', 'c']),
+        ('holding', 110, 2, ['d']),
+    ]
+
+
+def test_no_gaps_are_read_through_by_default():
+    reader = BlockReader(holding_registers={'a': 100, 'b': 102, 'c': 106})
+
+    assert planned(reader) == [
+        ('holding', 100, 4, ['a', 'b']),
+        ('holding', 106, 2, ['c']),
+    ]
@@ -0,0 +1,55 @@
+import h5py
+
+from livex.event_store import EVENT_DTYPE, EventStore
+from livex.filewriter import FileWriter
+from livex.queued_filewriter import QueuedFileWriter
+
+DTYPES = {'events': EVENT_DTYPE, 'event_keys': 'str', 'event_strings': 'str'}
+
+
+def acquire(writer, store, events):
+    """Run one acquisition into the writer's file, recording the given events."""
+    writer.open_file()
+    store.reset(
+        keys=writer.read_dataset('event_data', 'event_keys'),
+        strings=writer.read_dataset('event_data', 'event_strings')
+    )
+    for frame, (key, value) in enumerate(events):
+        store.add(key, value, frame=frame)
+    assert writer.write_hdf5(store.take(), 'event_data')
+    writer.close_file()
+
+
+def test_two_acquisitions_into_one_file_decode(tmp_path):
+    writer = QueuedFileWriter(FileWriter(str(tmp_path), 'events', dtypes=DTYPES))
+    store = EventStore()
+
+    acquire(writer, store, [('setpoint_upper', 500.0), ('profile', 'ramp')])
+    acquire(writer, store, [('gradient_enable', True), ('profile', 'hold'),
+                            ('setpoint_upper', 600.0), ('profile', 'ramp')])
+
+    with h5py.File(tmp_path / 'events.h5', 'r') as f:
+        group = f['event_data']
+        decoded = EventStore.decode(
+            group['events'][:], group['event_keys'][:], group['event_strings'][:]
+        )
+        assert len(group['event_keys']) == 3
+        assert len(group['event_strings']) == 2
+
+    assert decoded == [
+        (0, 'setpoint_upper', 500.0), (1, 'profile', 'ramp'),
+        (0, 'gradient_enable', 1.0), (1, 'profile', 'hold'),
+        (2, 'setpoint_upper', 600.0), (3, 'profile', 'ramp'),
+    ]
+
+
+def test_reset_indexes_past_repeated_table_entries():
+    store = EventStore()
+    store.reset(keys=[b'a', b'b', b'a'])
+
+    store.add('b', 1)
+    store.add('c', 2)
+
+    data = store.take()
+    assert data['events']['key'].tolist() == [1, 3]
+    assert data['event_keys'] == ['c']
@@ -0,0 +1,66 @@
+import h5py
+import numpy as np
+import pytest
+
+from livex.pid_sweep import params_from_hdf5
+
+RATE = 20  # Frames per second
+
+
+def record(path, heat_gain=3.0, loss=0.004, room=25.0, seconds=600):
+    """Write a file of a furnace following the fitted model exactly, with a repeated frame."""
+    frames = np.arange(1, seconds * RATE + 1, dtype=float)
+    t = frames / RATE
+    output = 0.5 + 0.3 * np.sin(t / 60)
+    temperature = np.empty_like(t)
+    temperature[0] = room
+    for i in range(1, len(t)):
+        rate = heat_gain * output[i - 1] ** 2 - loss * (temperature[i - 1] - room)
+        temperature[i] = temperature[i - 1] + rate / RATE
+    received = 1000 + t + np.random.default_rng(0).uniform(0, 0.01, len(t))
+
+    fast = np.insert(np.arange(len(frames)), 100, 99)  # Row 99 received twice
+    slow = np.arange(0, len(frames), RATE)
+    with h5py.File(path, 'w') as f:
+        f['fast_data/frame'] = frames[fast]
+        f['fast_data/temperature_upper'] = temperature[fast]
+        f['fast_data/temperature_lower'] = temperature[fast]
+        f['fast_data/host_monotonic'] = received[fast]
+        f['slow_data/frame'] = frames[slow]
+        f['slow_data/output_upper'] = output[slow]
+        f['slow_data/output_lower'] = output[slow]
+
+
+def test_fit_finds_frame_rate_and_skips_repeated_frames(tmp_path):
+    path = tmp_path / 'fit.h5'
+    record(path)
+
+    params, start = params_from_hdf5(path)
+
+    assert params.heat_gain == pytest.approx(3.0, rel=0.05)
+    assert params.loss == pytest.approx(0.004, rel=0.05)
+    assert start.tolist() == [25.0, 25.0]
+
+
+def test_frames_going_backwards_are_rejected(tmp_path):
+    path = tmp_path / 'two_runs.h5'
+    record(path)
+    with h5py.File(path, 'a') as f:
+        frames = f['fast_data/frame'][()]
+        frames[500:] -= 400
+        f['fast_data/frame'][...] = frames
+
+    with pytest.raises(ValueError, match='go back'):
+        params_from_hdf5(path)
+
+
+def test_frame_rate_is_needed_without_receive_times(tmp_path):
+    path = tmp_path / 'no_times.h5'
+    record(path)
+    with h5py.File(path, 'a') as f:
+        del f['fast_data/host_monotonic']
+
+    with pytest.raises(ValueError, match='pid_frequency'):
+        params_from_hdf5(path)
+    params, _ = params_from_hdf5(path, pid_frequency=RATE)
+    assert params.heat_gain == pytest.approx(3.0, rel=0.05)
@@ -0,0 +1,56 @@
+import time
+
+import h5py
+import numpy as np
+
+from livex.filewriter import FileWriter
+from livex.queued_filewriter import QueuedFileWriter
+
+
+def stream_data(frames):
+    return {'frame': np.array(frames, dtype=float)}
+
+
+def test_restart_after_writer_stops_writes_only_new_data(tmp_path):
+    file_writer = FileWriter(str(tmp_path), 'first')
+    writer = QueuedFileWriter(file_writer)
+    released = []
+
+    writer.open_file()
+    assert writer.write_hdf5(stream_data([5, 6, 7]), 'fast', on_written=lambda: released.append(1))
+
+    # Stop the writer thread mid-acquisition, as a stream error would, with a batch queued behind it
+    writer.queue.put(None)
+    writer.thread.join(5)
+    stale = (file_writer.write_hdf5, (stream_data([8]), 'fast'),
+             lambda: released.append(2), time.monotonic(), None)
+    writer.queue.put(stale)
+
+    # The tail written on stopping the acquisition is dropped, not queued for a dead thread
+    assert not writer.write_hdf5(stream_data([9]), 'fast', on_written=lambda: released.append(3),
+                                 block=True)
+    writer.close_file()
+    assert sorted(released) == [1, 2, 3]
+    assert writer.queue_depth == 0
+
+    file_writer.filename = 'second'
+    file_writer.set_fullpath()
+    writer.open_file()
+    assert writer.write_hdf5(stream_data([100, 101, 102]), 'fast')
+    writer.close_file()
+
+    with h5py.File(tmp_path / 'first.h5', 'r') as f:
+        assert f['fast/frame'][:].tolist() == [5, 6, 7]
+    with h5py.File(tmp_path / 'second.h5', 'r') as f:
+        assert f['fast/frame'][:].tolist() == [100, 101, 102]
+
+
+def test_write_after_close_is_dropped(tmp_path):
+    writer = QueuedFileWriter(FileWriter(str(tmp_path), 'closed'))
+    writer.open_file()
+    writer.close_file()
+
+    released = []
+    assert not writer.write_hdf5(stream_data([1]), 'fast', on_written=lambda: released.append(1))
+    assert released == [1]
+    assert writer.dropped_batches == 1
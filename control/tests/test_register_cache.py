@@ -0,0 +1,62 @@
+from livex.register_cache import CachingClient
+
+
+class Response:
+    """Modbus response stand-in, optionally an error."""
+
+    def __init__(self, registers=(), bits=(), error=False):
+        self.registers = list(registers)
+        self.bits = list(bits)
+        self.error = error
+
+    def isError(self):
+        return self.error
+
+
+class FakeDevice:
+    """Modbus client stand-in holding registers, which can be made to answer with errors."""
+
+    def __init__(self):
+        self.holding = {}
+        self.fail = False
+
+    def read_holding_registers(self, address, count=1, slave=1):
+        if self.fail:
+            return Response(error=True)
+        return Response(registers=[self.holding.get(address + i, 0) for i in range(count)])
+
+    def write_registers(self, address, values, slave=1, skip_encode=False):
+        if self.fail:
+            return Response(error=True)
+        for i, value in enumerate(values):
+            self.holding[address + i] = value
+        return Response()
+
+
+def test_write_invalidates_and_updates_cached_registers():
+    device = FakeDevice()
+    device.holding = {10: 1, 11: 2}
+    client = CachingClient(device, ttl=60)
+
+    client.read_holding_registers(10, count=2)
+    assert client.cache.get('holding', 10, 2) == [1, 2]
+
+    client.write_registers(11, [7])
+    assert client.cache.get('holding', 10, 2) == [1, 7]
+
+    # A failed write leaves the registers it covered unknown, rather than holding either value
+    device.fail = True
+    client.write_registers(10, [5])
+    assert client.cache.get('holding', 10) is None
+    assert client.cache.get('holding', 11) == [7]
+
+
+def test_error_responses_are_not_cached():
+    device = FakeDevice()
+    device.fail = True
+    client = CachingClient(device, ttl=60)
+
+    response = client.read_holding_registers(10, count=2)
+    assert response.isError()
+    assert client.cache.get('holding', 10, 2) is None
+    assert client.cache.entries == {}
@@ -0,0 +1,81 @@
+import numpy as np
+
+from livex.packet_decoder import LiveXPacketDecoder
+from livex.stream_reassembler import StreamReassembler
+
+DECODER = LiveXPacketDecoder(pid_debug=True)
+
+
+def packets(frames):
+    data = np.zeros(len(frames), dtype=DECODER.dtype)
+    data['frame'] = frames
+    data['temperature_upper'] = 25.5
+    return data.tobytes()
+
+
+def frames_of(data):
+    return np.frombuffer(data, dtype=DECODER.dtype)['frame'].tolist()
+
+
+class ChunkSocket:
+    """Socket-like object returning the given chunks from successive recv_into calls."""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv_into(self, buffer, nbytes=0):
+        chunk = self.chunks.pop(0)
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def receive_all(reassembler, chunks):
+    sock = ChunkSocket(chunks)
+    received = b''
+    while sock.chunks:
+        received += reassembler.recv(sock)
+    return received
+
+
+def test_garbage_prefix_is_discarded():
+    reassembler = StreamReassembler(DECODER, capacity=16)
+    garbage = b'\xff\x13\x07'
+
+    received = receive_all(reassembler, [garbage + packets([1, 2, 3, 4])])
+
+    assert frames_of(received) == [1, 2, 3, 4]
+    assert reassembler.discarded_bytes == len(garbage)
+    assert reassembler.resync_count == 1
+
+
+def test_packets_split_across_reads():
+    reassembler = StreamReassembler(DECODER, capacity=16)
+    data = packets(range(1, 7))
+    cuts = [0, 5, DECODER.size + 3, 2 * DECODER.size, 4 * DECODER.size - 1, len(data)]
+
+    received = receive_all(reassembler, [data[a:b] for a, b in zip(cuts, cuts[1:])])
+
+    assert frames_of(received) == [1, 2, 3, 4, 5, 6]
+    assert reassembler.discarded_bytes == 0
+
+
+def test_truncated_trailing_frame_is_held_back():
+    reassembler = StreamReassembler(DECODER, capacity=16)
+    data = packets([1, 2, 3])
+
+    received = receive_all(reassembler, [data[:-10]])
+    assert frames_of(received) == [1, 2]
+
+    received = receive_all(reassembler, [data[-10:]])
+    assert frames_of(received) == [3]
+    assert reassembler.discarded_bytes == 0
+
+
+def test_frames_past_float32_resolution_stay_aligned():
+    reassembler = StreamReassembler(DECODER, capacity=16)
+    first = 2 ** 24 - 2
+
+    received = receive_all(reassembler, [packets(range(first, first + 8))])
+
+    assert len(frames_of(received)) == 8
+    assert reassembler.resync_count == 0
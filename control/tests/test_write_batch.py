@@ -0,0 +1,74 @@
+import pytest
+
+from livex.write_batch import BatchingClient
+
+
+class RecordingClient:
+    """Modbus client stand-in recording the requests made of it."""
+
+    def __init__(self):
+        self.requests = []
+
+    def write_registers(self, address, values, slave=1, skip_encode=False):
+        self.requests.append(('write_registers', address, list(values)))
+
+    def write_coils(self, address, values, slave=1):
+        self.requests.append(('write_coils', address, list(values)))
+
+    def write_coil(self, address, value, slave=1):
+        self.requests.append(('write_coil', address, value))
+
+
+def words(*values):
+    return [value.to_bytes(2, 'big') for value in values]
+
+
+def test_adjacent_holding_writes_are_merged():
+    raw = RecordingClient()
+    client = BatchingClient(raw)
+
+    with client.batch():
+        client.write_registers(10, [1, 2])
+        client.write_registers(12, [3, 4])
+        client.write_register(11, 9)  # Over a register already held
+        assert raw.requests == []
+
+    assert raw.requests == [('write_registers', 10, words(1, 9, 3, 4))]
+    assert client.write_requests == 1
+    assert client.batched_writes == 3
+
+
+def test_coil_writes_are_kept_apart_and_in_order():
+    raw = RecordingClient()
+    client = BatchingClient(raw)
+
+    with client.batch():
+        client.write_registers(10, [1, 2])
+        client.write_coil(5, True)
+        client.write_coil(6, True)
+        client.write_registers(12, [3, 4])
+        client.write_coil(5, False)
+
+    assert raw.requests == [
+        ('write_registers', 10, words(1, 2)),
+        ('write_coils', 5, [True]),
+        ('write_coils', 6, [True]),
+        ('write_registers', 12, words(3, 4)),
+        ('write_coils', 5, [False]),
+    ]
+
+
+def test_held_writes_are_discarded_when_the_batch_raises():
+    raw = RecordingClient()
+    client = BatchingClient(raw)
+
+    with pytest.raises(RuntimeError):
+        with client.batch():
+            client.write_registers(10, [1, 2])
+            client.write_coil(5, True)
+            raise RuntimeError("sequence failed")
+
+    assert raw.requests == []
+    # The client is usable again afterwards, with writes going straight through
+    client.write_coil(5, True)
+    assert raw.requests == [('write_coil', 5, True)]